@@ -1,4 +1,6 @@
 # flake8: noqa
-from .signals import model_activations_changed, model_activations_updated
+from .signals import (
+    ActivationReceiversError, model_activations_changed, model_activations_updated, on_activated, on_deactivated,
+)
 from .version import __version__
 
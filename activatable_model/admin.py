@@ -0,0 +1,90 @@
+from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count
+
+
+class ActivationStateListFilter(admin.SimpleListFilter):
+    """
+    Filters the change list by the activation state of the model. The number of active and inactive rows
+    are shown next to the choices and are counted with a single conditional aggregation query. Set
+    show_counts to False to skip counting.
+    """
+    title = 'active'
+    parameter_name = 'is_active'
+    show_counts = True
+
+    def lookups(self, request, model_admin):
+        if not self.show_counts:
+            return (('1', 'Active'), ('0', 'Inactive'))
+
+        counts = model_admin.get_queryset(request).order_by().aggregate(
+            num_active=Count('pk', filter=self._get_filter(model_admin.model, True)),
+            num_inactive=Count('pk', filter=self._get_filter(model_admin.model, False)),
+        )
+        return (
+            ('1', 'Active ({0})'.format(counts['num_active'])),
+            ('0', 'Inactive ({0})'.format(counts['num_inactive'])),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() in ('0', '1'):
+            return queryset.filter(self._get_filter(queryset.model, self.value() == '1'))
+        return queryset
+
+    def _get_filter(self, model, is_active):
+        return model.ACTIVATION_STATE.get_filter(model.ACTIVATABLE_FIELD_NAME, is_active)
+
+
+class ActivatableModelAdmin(admin.ModelAdmin):
+    """
+    An admin for activatable models. It provides actions that activate and deactivate the selected rows
+    with set-based updates in chunks of activation_chunk_size rows, each in its own transaction, and filters
+    by activation state.
+
+    Deleting an activatable model deactivates it, so the default delete_selected action, which loads and logs
+    every selected instance, is replaced by the deactivate action. The delete view does not run the deletion
+    collector on related objects, since nothing is deleted.
+    """
+    activation_chunk_size = 1000
+
+    actions = ['activate_selected', 'deactivate_selected']
+
+    def get_list_filter(self, request):
+        return (ActivationStateListFilter,) + tuple(super(ActivatableModelAdmin, self).get_list_filter(request))
+
+    def get_actions(self, request):
+        actions = super(ActivatableModelAdmin, self).get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Returns the objects that are deactivated instead of collecting the objects that a deletion would cascade to.
+        """
+        opts = self.model._meta
+        perms_needed = set() if self.has_delete_permission(request) else {opts.verbose_name}
+        return [str(obj) for obj in objs], {opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def set_active_selected(self, request, queryset, is_active):
+        """
+        Activates or deactivates the selected rows in chunks and returns the number of rows that changed.
+        """
+        num_changed = 0
+        for pks in queryset._iter_pk_chunks(self.activation_chunk_size):
+            with transaction.atomic(using=queryset.db):
+                chunk_queryset = queryset.model._default_manager.using(queryset.db).filter(pk__in=pks)
+                update_activation = chunk_queryset.activate if is_active else chunk_queryset.deactivate
+                result = update_activation(return_result=True)
+            num_changed += result.changed_count
+
+        self.message_user(request, '{0} {1} {2}.'.format(
+            'Activated' if is_active else 'Deactivated', num_changed, self.model._meta.verbose_name_plural))
+        return num_changed
+
+    @admin.action(permissions=['change'], description='Activate selected %(verbose_name_plural)s')
+    def activate_selected(self, request, queryset):
+        self.set_active_selected(request, queryset, True)
+
+    @admin.action(permissions=['change'], description='Deactivate selected %(verbose_name_plural)s')
+    def deactivate_selected(self, request, queryset):
+        self.set_active_selected(request, queryset, False)
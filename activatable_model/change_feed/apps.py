@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class ChangeFeedConfig(AppConfig):
+    name = 'activatable_model.change_feed'
+    label = 'activatable_model_change_feed'
+    verbose_name = 'Django Activatable Model Change Feed'
+
+    def ready(self):
+        from activatable_model.change_feed.feed import record_activation_changes
+        from activatable_model.signals import model_activations_changed
+        model_activations_changed.connect(record_activation_changes, dispatch_uid='activatable_model_change_feed')
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+
+from activatable_model.change_feed.models import ActivationChange
+from activatable_model.signals import send_activations_changed
+
+
+def get_batch_size():
+    """
+    The maximum number of instance ids stored in a single change record.
+    """
+    return getattr(settings, 'ACTIVATABLE_MODEL_CHANGE_FEED_BATCH_SIZE', 1000)
+
+
+def record_activation_changes(sender, instance_ids, is_active, change_sequence=None, **kwargs):
+    """
+    Appends the changed instance ids to the change feed in batches. Changes that are being dispatched from
+    the change feed (i.e. that have a change_sequence) are not recorded again.
+    """
+    if change_sequence is not None or not instance_ids:
+        return
+
+    content_type = ContentType.objects.get_for_model(sender)
+    batch_size = get_batch_size()
+    ActivationChange.objects.bulk_create([
+        ActivationChange(
+            content_type=content_type, instance_ids=list(instance_ids[i:i + batch_size]), is_active=is_active)
+        for i in range(0, len(instance_ids), batch_size)
+    ])
+
+
+def prune_activation_changes(older_than):
+    """
+    Deletes change records that are older than the older_than timedelta. Returns the number of deleted records.
+    """
+    return ActivationChange.objects.filter(time__lt=timezone.now() - older_than).delete()[0]
+
+
+class ActivationChangeConsumer(object):
+    """
+    Polls the change feed incrementally from the last consumed sequence number and dispatches the changes
+    in the current process. Each process keeps its own consumer.
+
+    If last_sequence is None, the consumer starts at the end of the feed when it first polls. Sequence numbers
+    are assigned when changes are recorded and not when they are committed, so a change from a long running
+    transaction can be committed after a later sequence number has already been consumed. The consumer keeps
+    track of the sequence numbers it skipped over and polls them again until they show up or until they are
+    older than gap_timeout, after which their transactions are assumed to have rolled back.
+    """
+    def __init__(self, last_sequence=None, batch_size=100, gap_timeout=timedelta(minutes=5)):
+        self.last_sequence = last_sequence
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+
+        # The skipped sequence numbers, mapped to the time they were first skipped
+        self.gaps = {}
+
+    def poll(self):
+        """
+        Returns the next batch of change records, including skipped records that were committed since, and
+        advances the last consumed sequence number.
+        """
+        if self.last_sequence is None:
+            latest_change = ActivationChange.objects.order_by('-id').only('id').first()
+            self.last_sequence = latest_change.id if latest_change else 0
+            return []
+
+        now = timezone.now()
+        self.gaps = {
+            sequence: skipped_time for sequence, skipped_time in self.gaps.items()
+            if now - skipped_time < self.gap_timeout
+        }
+        changes = list(
+            ActivationChange.objects.filter(Q(id__gt=self.last_sequence) | Q(id__in=self.gaps)).order_by('id')[
+                :self.batch_size
+            ]
+        )
+
+        sequences = set(change.id for change in changes)
+        for sequence in sequences.intersection(self.gaps):
+            del self.gaps[sequence]
+
+        new_sequences = [sequence for sequence in sequences if sequence > self.last_sequence]
+        if new_sequences:
+            last_sequence = max(new_sequences)
+            for sequence in range(self.last_sequence + 1, last_sequence):
+                if sequence not in sequences:
+                    self.gaps[sequence] = now
+            self.last_sequence = last_sequence
+        return changes
+
+    def dispatch(self):
+        """
+        Sends model_activations_changed for the next batch of change records. Receivers are passed the
+        sequence number of the change as the change_sequence keyword argument. Returns the number of
+        dispatched change records.
+        """
+        changes = self.poll()
+        for change in changes:
+            model = ContentType.objects.get_for_id(change.content_type_id).model_class()
+            if model is not None:
+                send_activations_changed(
+                    model, instance_ids=change.instance_ids, is_active=change.is_active,
+                    change_sequence=change.id)
+        return len(changes)
@@ -0,0 +1,15 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class ActivationChange(models.Model):
+    """
+    An outbox record of the ids of a model whose activation state changed. The id of the record is the
+    sequence number that consumers of the change feed poll from.
+    """
+    id = models.BigAutoField(primary_key=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    instance_ids = models.JSONField(encoder=DjangoJSONEncoder)
+    is_active = models.BooleanField()
+    time = models.DateTimeField(auto_now_add=True, db_index=True)
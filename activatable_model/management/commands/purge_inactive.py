@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from activatable_model.models import BaseActivatableModel
+
+
+class Command(BaseCommand):
+    help = 'Hard deletes the inactive rows of an activatable model in primary key ordered chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='The activatable model to purge, as app_label.ModelName')
+        parser.add_argument(
+            '--older-than-days', type=float, default=None,
+            help='Only purge rows deactivated more than this many days ago')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000, help='The number of rows deleted per transaction')
+        parser.add_argument(
+            '--throttle', type=float, default=None, help='The number of seconds to sleep between chunks')
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report the number of rows that would be purged')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        if not issubclass(model, BaseActivatableModel):
+            raise CommandError('{0} is not an activatable model'.format(model._meta.label))
+
+        older_than = None
+        if options['older_than_days'] is not None:
+            older_than = timedelta(days=options['older_than_days'])
+
+        try:
+            num_purged = model.objects.purge_inactive(
+                older_than=older_than, chunk_size=options['chunk_size'], throttle=options['throttle'],
+                dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('{0} {1} inactive {2} rows'.format(
+            'Would purge' if options['dry_run'] else 'Purged', num_purged, model._meta.label))
@@ -1,8 +1,56 @@
-from django.db import models
+from datetime import timedelta
+import time
+
+from django.db import OperationalError, models, router, transaction
+from django.db.models import Case, Exists, ExpressionWrapper, OuterRef, Q, Value, When
+from django.utils import timezone
 
 from manager_utils import ManagerUtilsQuerySet, ManagerUtilsManager
 
-from activatable_model.signals import model_activations_changed, model_activations_updated
+from activatable_model.signals import model_activations_updated, send_activations_changed
+from activatable_model.states import BooleanActivationState
+
+
+# The number of times that bulk updates of partitioned models are retried when concurrently moved rows fail them
+ROW_MOVEMENT_MAX_RETRIES = 3
+
+
+class ActivationResult(object):
+    """
+    The result of a bulk activation or deactivation. It holds the ids that were already collected for the
+    activation signals and streams the affected instances from the database of the queryset in chunks, so that
+    post-processing the affected rows never loads all of the instances at once.
+    """
+    def __init__(self, model, is_active, num_updated_rows, changed_instance_ids, updated_instance_ids, db=None):
+        self.model = model
+        self.db = db
+        self.is_active = is_active
+        self.num_updated_rows = num_updated_rows
+        self.changed_instance_ids = changed_instance_ids
+        self.updated_instance_ids = updated_instance_ids
+
+    @property
+    def changed_count(self):
+        return len(self.changed_instance_ids)
+
+    @property
+    def updated_count(self):
+        return len(self.updated_instance_ids)
+
+    def iterator(self, chunk_size=2000, changed_only=True):
+        """
+        Yields the changed instances (or all updated instances if changed_only is False) in chunks of
+        chunk_size ids. Each chunk is fetched with a server-side cursor where the database supports it.
+        """
+        instance_ids = self.changed_instance_ids if changed_only else self.updated_instance_ids
+        for i in range(0, len(instance_ids), chunk_size):
+            chunk_queryset = self.model._default_manager.using(self.db).filter(
+                id__in=instance_ids[i:i + chunk_size]).order_by('id')
+            for instance in chunk_queryset.iterator(chunk_size=chunk_size):
+                yield instance
+
+    def __iter__(self):
+        return self.iterator()
 
 
 class ActivatableQuerySet(ManagerUtilsQuerySet):
@@ -11,50 +59,281 @@ class ActivatableQuerySet(ManagerUtilsQuerySet):
     """
     def update(self, *args, **kwargs):
         if self.model.ACTIVATABLE_FIELD_NAME in kwargs:
+            value = kwargs[self.model.ACTIVATABLE_FIELD_NAME]
+            if isinstance(value, Value):
+                value = value.value
+            elif hasattr(value, 'resolve_expression'):
+                # The new activation state of expressions like F() or Case() can differ between the rows, so it is
+                # fetched for each row along with the previous state
+                field = self.model._meta.get_field(self.model.ACTIVATABLE_FIELD_NAME)
+                return self._update_activation_per_row(
+                    kwargs, ExpressionWrapper(value, output_field=field), self.model.ACTIVATION_STATE.is_active_value)
+            return self._update_activation(self.model.ACTIVATION_STATE.is_active_value(value), kwargs)
+        return super(ActivatableQuerySet, self).update(*args, **kwargs)
+
+    def _update_activation(self, is_active, update_kwargs, return_result=False):
+        """
+        Updates the queryset with update_kwargs, which set the activatable field to the given activation state,
+        and sends the activation signals. Returns the number of updated rows, or an ActivationResult if
+        return_result is True.
+        """
+        if self.model.TRACK_ACTIVATIONS_WITH_TRIGGERS and not return_result:
+            # Database triggers record the changes, so the instances do not need to be fetched
+            return self._retry_row_movement(lambda: super(ActivatableQuerySet, self).update(**update_kwargs))
+
+        def fetch_and_update():
             # Fetch the instances that are about to be updated if they have an activatable flag. This
             # is because their activatable flag may be changed in the subsequent update, causing us
             # to potentially lose what this original query referenced
-            new_active_state_kwargs = {
-                self.model.ACTIVATABLE_FIELD_NAME: kwargs.get(self.model.ACTIVATABLE_FIELD_NAME)
-            }
-            changed_instance_ids = list(self.exclude(**new_active_state_kwargs).values_list('id', flat=True))
+            new_active_state = self.model.ACTIVATION_STATE.get_filter(self.model.ACTIVATABLE_FIELD_NAME, is_active)
+            changed_instance_ids = list(self.exclude(new_active_state).values_list('id', flat=True))
             updated_instance_ids = list(self.values_list('id', flat=True))
+            ret_val = super(ActivatableQuerySet, self).update(**update_kwargs)
+            return changed_instance_ids, updated_instance_ids, ret_val
 
-        ret_val = super(ActivatableQuerySet, self).update(*args, **kwargs)
+        changed_instance_ids, updated_instance_ids, ret_val = self._retry_row_movement(fetch_and_update)
 
-        if self.model.ACTIVATABLE_FIELD_NAME in kwargs and updated_instance_ids:
+        if updated_instance_ids and not self.model.TRACK_ACTIVATIONS_WITH_TRIGGERS:
             # send the instances that were updated to the activation signals
-            model_activations_changed.send(
-                self.model, instance_ids=changed_instance_ids,
-                is_active=kwargs[self.model.ACTIVATABLE_FIELD_NAME])
-            model_activations_updated.send(
-                self.model, instance_ids=updated_instance_ids,
-                is_active=kwargs[self.model.ACTIVATABLE_FIELD_NAME])
+            send_activations_changed(self.model, instance_ids=changed_instance_ids, is_active=is_active)
+            model_activations_updated.send(self.model, instance_ids=updated_instance_ids, is_active=is_active)
+
+        if return_result:
+            return ActivationResult(
+                self.model, is_active, ret_val, changed_instance_ids, updated_instance_ids, db=self.db)
         return ret_val
 
-    def activate(self):
-        return self.update(**{
-            self.model.ACTIVATABLE_FIELD_NAME: True
-        })
+    def _retry_row_movement(self, fetch_and_update):
+        """
+        Calls fetch_and_update, which fetches and updates the activatable field of the queryset. Updating the
+        activatable field of a table that is partitioned by activation state moves rows between partitions,
+        which fails when a concurrent transaction moved the same rows first. fetch_and_update is then
+        retried in a savepoint, where it fetches the rows again in their new state.
+        """
+        if not self.model.PARTITION_BY_ACTIVATION:
+            return fetch_and_update()
+
+        for num_retries in range(ROW_MOVEMENT_MAX_RETRIES + 1):
+            try:
+                with transaction.atomic(using=self.db):
+                    return fetch_and_update()
+            except OperationalError as e:
+                if num_retries == ROW_MOVEMENT_MAX_RETRIES or 'moved to another partition' not in str(e):
+                    raise
 
-    def deactivate(self):
-        return self.update(**{
-            self.model.ACTIVATABLE_FIELD_NAME: False
-        })
+    def _get_activation_update_kwargs(self, is_active):
+        field = self.model._meta.get_field(self.model.ACTIVATABLE_FIELD_NAME)
+        return {
+            field.name: self.model.ACTIVATION_STATE.get_update_value(field, is_active)
+        }
+
+    def active(self):
+        """
+        Filters the queryset to active rows.
+        """
+        return self.filter(self.model.ACTIVATION_STATE.get_filter(self.model.ACTIVATABLE_FIELD_NAME, True))
+
+    def inactive(self):
+        """
+        Filters the queryset to inactive rows.
+        """
+        return self.filter(self.model.ACTIVATION_STATE.get_filter(self.model.ACTIVATABLE_FIELD_NAME, False))
+
+    def _get_parent_active_condition(self):
+        """
+        Returns the condition that the parent of a row is effectively active, or None if the model does not
+        inherit activation. Rows without a parent only depend on their own activation state.
+        """
+        if not self.model.ACTIVATION_PARENT_FIELD:
+            return None
+
+        parent_field = self.model._meta.get_field(self.model.ACTIVATION_PARENT_FIELD)
+        condition = Exists(
+            parent_field.related_model.objects.effectively_active().filter(pk=OuterRef(parent_field.attname))
+        )
+        if parent_field.null:
+            condition = Q(**{'{0}__isnull'.format(parent_field.attname): True}) | condition
+        return condition
+
+    def effectively_active(self):
+        """
+        Filters the queryset to rows that are active and whose parents are effectively active.
+        """
+        queryset = self.active()
+        parent_active_condition = self._get_parent_active_condition()
+        return queryset.filter(parent_active_condition) if parent_active_condition is not None else queryset
+
+    def effectively_inactive(self):
+        """
+        Filters the queryset to rows that are inactive or whose parents are effectively inactive.
+        """
+        parent_active_condition = self._get_parent_active_condition()
+        if parent_active_condition is None:
+            return self.inactive()
+        inactive_condition = self.model.ACTIVATION_STATE.get_filter(self.model.ACTIVATABLE_FIELD_NAME, False)
+        return self.filter(inactive_condition | ~parent_active_condition)
+
+    def _get_inherited_change_ids(self, parent_instance_ids, check_ancestors=True):
+        """
+        Returns the ids of the rows whose effective activation state changed along with the parents with the
+        given ids, i.e. the active rows of those parents. If check_ancestors is True, parents that do not
+        inherit an active state from their own ancestors are skipped.
+        """
+        parent_field = self.model._meta.get_field(self.model.ACTIVATION_PARENT_FIELD)
+        parents = parent_field.related_model.objects.filter(pk__in=parent_instance_ids)
+        if check_ancestors:
+            ancestors_active_condition = parents._get_parent_active_condition()
+            if ancestors_active_condition is not None:
+                parents = parents.filter(ancestors_active_condition)
+
+        return list(self.filter(**{
+            '{0}__in'.format(parent_field.name): parents.values('pk')
+        }).active().values_list('id', flat=True))
+
+    def activate(self, return_result=False):
+        return self._update_activation(True, self._get_activation_update_kwargs(True), return_result=return_result)
+
+    def deactivate(self, return_result=False):
+        return self._update_activation(
+            False, self._get_activation_update_kwargs(False), return_result=return_result)
+
+    def set_active(self, active_ids):
+        """
+        Activates the rows of the queryset with the given ids and deactivates all other rows of the queryset.
+        """
+        return self.set_active_where(Q(id__in=active_ids))
+
+    def set_active_where(self, condition):
+        """
+        Activates the rows of the queryset that match the condition Q object and deactivates all other rows of
+        the queryset in a single UPDATE with a CASE expression. The changed and updated ids of both directions
+        are fetched beforehand in a single query, and the activation signals are sent once per direction.
+        """
+        state = self.model.ACTIVATION_STATE
+        field = self.model._meta.get_field(self.model.ACTIVATABLE_FIELD_NAME)
+        update_kwargs = {
+            field.name: Case(
+                When(condition, then=state.get_update_value(field, True)),
+                default=state.get_update_value(field, False),
+                output_field=field,
+            )
+        }
+        return self._update_activation_per_row(update_kwargs, Case(
+            When(condition, then=Value(True)), default=Value(False), output_field=models.BooleanField()))
+
+    def _update_activation_per_row(self, update_kwargs, new_value, is_active_value=bool):
+        """
+        Updates the queryset with update_kwargs, which set the activatable field of each row to a state that is
+        given by the new_value expression, and sends the activation signals once per direction. The new values
+        and previous states of the rows are fetched beforehand in a single query, and is_active_value converts
+        the fetched new values to activation states.
+        """
+        state = self.model.ACTIVATION_STATE
+        if self.model.TRACK_ACTIVATIONS_WITH_TRIGGERS:
+            # Database triggers record the changes, so the instances do not need to be fetched
+            return self._retry_row_movement(lambda: super(ActivatableQuerySet, self).update(**update_kwargs))
+
+        def fetch_and_update():
+            rows = list(self.annotate(
+                _activatable_new_value=new_value,
+                _activatable_was_active=Case(
+                    When(state.get_filter(self.model.ACTIVATABLE_FIELD_NAME, True), then=Value(True)),
+                    default=Value(False), output_field=models.BooleanField()),
+            ).values_list('id', '_activatable_new_value', '_activatable_was_active'))
+            return rows, super(ActivatableQuerySet, self).update(**update_kwargs)
+
+        rows, ret_val = self._retry_row_movement(fetch_and_update)
+        rows = [(instance_id, is_active_value(value), was_active) for instance_id, value, was_active in rows]
+
+        for is_active in (True, False):
+            updated_instance_ids = [row[0] for row in rows if row[1] == is_active]
+            if updated_instance_ids:
+                changed_instance_ids = [row[0] for row in rows if row[1] == is_active and row[2] != is_active]
+                send_activations_changed(self.model, instance_ids=changed_instance_ids, is_active=is_active)
+                model_activations_updated.send(self.model, instance_ids=updated_instance_ids, is_active=is_active)
+        return ret_val
 
     def delete(self, force=False):
         return super(ActivatableQuerySet, self).delete() if force else self.deactivate()
 
+    def _iter_pk_chunks(self, chunk_size):
+        """
+        Yields lists of at most chunk_size primary keys of the queryset in primary key order. Each chunk
+        is fetched with a keyset query so that neither the instances nor all primary keys are loaded at once.
+        """
+        queryset = self.order_by('pk')
+        last_pk = None
+        while True:
+            chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(chunk_queryset.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return
+            yield pks
+            last_pk = pks[-1]
+
+    def purge_inactive(self, older_than=None, chunk_size=1000, throttle=None, dry_run=False):
+        """
+        Hard deletes the inactive rows of the queryset in primary key ordered chunks, using a short transaction
+        for each chunk. older_than is a timedelta or datetime and is only supported by activation states that
+        record when rows were deactivated. Each chunk is deleted with delete(force=True), so related rows are
+        handled by their on_delete behavior (which is never CASCADE for activatable models unless
+        ALLOW_CASCADE_DELETE is set). throttle is the number of seconds to sleep between chunks.
+
+        Returns the number of purged rows, or the number of rows that would be purged if dry_run is True.
+        """
+        queryset = self.inactive()
+        if older_than is not None:
+            cutoff = timezone.now() - older_than if isinstance(older_than, timedelta) else older_than
+            queryset = queryset.filter(self.model.ACTIVATION_STATE.get_inactive_before_filter(
+                self.model.ACTIVATABLE_FIELD_NAME, cutoff))
+
+        num_purged = 0
+        for chunk_num, pks in enumerate(queryset._iter_pk_chunks(chunk_size)):
+            if throttle and chunk_num:
+                time.sleep(throttle)
+
+            if dry_run:
+                num_purged += len(pks)
+            else:
+                # Filter the chunk by the purge conditions again so that rows reactivated since the chunk was
+                # fetched are kept
+                with transaction.atomic(using=queryset.db):
+                    num_deleted_per_model = queryset.filter(pk__in=pks).delete(force=True)[1]
+                num_purged += num_deleted_per_model.get(self.model._meta.label, 0)
+
+        return num_purged
+
 
 class ActivatableManager(ManagerUtilsManager):
     def get_queryset(self):
         return ActivatableQuerySet(self.model)
 
-    def activate(self):
-        return self.get_queryset().activate()
+    def active(self):
+        return self.get_queryset().active()
+
+    def inactive(self):
+        return self.get_queryset().inactive()
 
-    def deactivate(self):
-        return self.get_queryset().deactivate()
+    def activate(self, return_result=False):
+        return self.get_queryset().activate(return_result=return_result)
+
+    def deactivate(self, return_result=False):
+        return self.get_queryset().deactivate(return_result=return_result)
+
+    def set_active(self, active_ids):
+        return self.get_queryset().set_active(active_ids)
+
+    def set_active_where(self, condition):
+        return self.get_queryset().set_active_where(condition)
+
+    def effectively_active(self):
+        return self.get_queryset().effectively_active()
+
+    def effectively_inactive(self):
+        return self.get_queryset().effectively_inactive()
+
+    def purge_inactive(self, **kwargs):
+        return self.get_queryset().purge_inactive(**kwargs)
 
 
 class BaseActivatableModel(models.Model):
@@ -64,17 +343,43 @@ class BaseActivatableModel(models.Model):
     class Meta:
         abstract = True
 
-    # The name of the Boolean field that determines if this model is active or inactive. A field
-    # must be defined with this name, and it must be a BooleanField. Note that the reason we don't
-    # define a BooleanField is because this would eliminate the ability for the user to easily
-    # define default values for the field and if it is indexed.
+    # The name of the field that determines if this model is active or inactive. A field must be
+    # defined with this name, and it must be compatible with ACTIVATION_STATE (a BooleanField by
+    # default). Note that the reason we don't define a BooleanField is because this would eliminate
+    # the ability for the user to easily define default values for the field and if it is indexed.
     ACTIVATABLE_FIELD_NAME = 'is_active'
 
+    # How the activatable field stores the active state. Use TimestampActivationState for a nullable
+    # deactivation time or EnumActivationState for a status field
+    ACTIVATION_STATE = BooleanActivationState()
+
     # There are situations where you might actually want other models to be able to force-delete
     # you ActivatibleModel.  In this case, no special delete action is taken and you model will
     # be removed from the database.  To enable this behavior, set ALLOW_CASCADE_DELETE to True
     ALLOW_CASCADE_DELETE = False
 
+    # By default, saves determine if the activation state changed by comparing against the value that
+    # was loaded into memory, which sends duplicate signals when concurrent processes change the same
+    # row. Set CONDITIONAL_ACTIVATION_SAVE to True to have saves of existing rows write the activatable
+    # field with a conditional UPDATE and only treat the state as changed if the UPDATE changed the row
+    CONDITIONAL_ACTIVATION_SAVE = False
+
+    # Set TRACK_ACTIVATIONS_WITH_TRIGGERS to True when the table of the model has activation triggers
+    # installed with activatable_model.triggers.operations.InstallActivationTriggers. Activation changes,
+    # including ones made with raw SQL, are then only signaled by drain_activation_changes, and saves and
+    # bulk updates neither fetch the changed instances nor send the activation signals themselves
+    TRACK_ACTIVATIONS_WITH_TRIGGERS = False
+
+    # The name of a ForeignKey to another activatable model that this model inherits its activation from.
+    # Rows are then only effectively active if they and their parent are effectively active, which is
+    # computed by effectively_active() and effectively_inactive() instead of copying the state down
+    ACTIVATION_PARENT_FIELD = None
+
+    # Set PARTITION_BY_ACTIVATION to True when the table of the model is partitioned into active and inactive
+    # partitions with activatable_model.partitioning.PartitionByActivation. Bulk updates then retry when
+    # concurrent updates moved the same rows to another partition
+    PARTITION_BY_ACTIVATION = False
+
     objects = ActivatableManager()
 
     # The original activatable field value, for determining when it changes
@@ -89,6 +394,16 @@ class BaseActivatableModel(models.Model):
         # Keep track of the original activatable value to know when it changes
         self.__original_activatable_value = getattr(self, self.ACTIVATABLE_FIELD_NAME)
 
+    @property
+    def is_effectively_active(self):
+        """
+        Whether the instance and its ancestors are active. Loads each ancestor that is not cached yet.
+        """
+        if not self.ACTIVATION_STATE.is_active_value(getattr(self, self.ACTIVATABLE_FIELD_NAME)):
+            return False
+        parent = getattr(self, self.ACTIVATION_PARENT_FIELD) if self.ACTIVATION_PARENT_FIELD else None
+        return parent is None or parent.is_effectively_active
+
     def __setattr__(self, key, value):
         if key == self.ACTIVATABLE_FIELD_NAME:
             self.activatable_field_updated = True
@@ -98,20 +413,51 @@ class BaseActivatableModel(models.Model):
         """
         A custom save method that handles figuring out when something is activated or deactivated.
         """
+        if self.TRACK_ACTIVATIONS_WITH_TRIGGERS:
+            return super(BaseActivatableModel, self).save(*args, **kwargs)
+
         current_activable_value = getattr(self, self.ACTIVATABLE_FIELD_NAME)
-        is_active_changed = self.id is None or self.__original_activatable_value != current_activable_value
+        is_active = self.ACTIVATION_STATE.is_active_value(current_activable_value)
+        was_active = self.ACTIVATION_STATE.is_active_value(self.__original_activatable_value)
         self.__original_activatable_value = current_activable_value
 
-        ret_val = super(BaseActivatableModel, self).save(*args, **kwargs)
+        if self.CONDITIONAL_ACTIVATION_SAVE and self.id is not None:
+            ret_val, is_active_changed = self._save_conditionally(current_activable_value, is_active, *args, **kwargs)
+        else:
+            is_active_changed = self.id is None or was_active != is_active
+            ret_val = super(BaseActivatableModel, self).save(*args, **kwargs)
 
         # Emit the signals for when the is_active flag is changed
         if is_active_changed:
-            model_activations_changed.send(self.__class__, instance_ids=[self.id], is_active=current_activable_value)
+            send_activations_changed(self.__class__, instance_ids=[self.id], is_active=is_active)
         if self.activatable_field_updated:
-            model_activations_updated.send(self.__class__, instance_ids=[self.id], is_active=current_activable_value)
+            model_activations_updated.send(self.__class__, instance_ids=[self.id], is_active=is_active)
 
         return ret_val
 
+    def _save_conditionally(self, current_activable_value, is_active, *args, **kwargs):
+        """
+        Writes the activatable field with an UPDATE that only matches the row if it is not already in the new
+        activation state and saves the remaining fields. Returns the return value of save and whether the
+        activation state of the row was changed by this save.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.ACTIVATABLE_FIELD_NAME not in update_fields:
+            return super(BaseActivatableModel, self).save(*args, **kwargs), False
+
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            num_changed_rows = self.__class__._base_manager.using(using).filter(pk=self.pk).exclude(
+                self.ACTIVATION_STATE.get_filter(self.ACTIVATABLE_FIELD_NAME, is_active)
+            ).update(**{self.ACTIVATABLE_FIELD_NAME: current_activable_value})
+
+            # Save the other fields. Note that Django skips the save when update_fields is empty
+            if update_fields is not None:
+                kwargs['update_fields'] = [name for name in update_fields if name != self.ACTIVATABLE_FIELD_NAME]
+            ret_val = super(BaseActivatableModel, self).save(*args, **kwargs)
+
+        return ret_val, num_changed_rows > 0
+
     def delete(self, force=False, **kwargs):
         """
         It is impossible to delete an activatable model unless force is True. This function instead sets it to inactive.
@@ -119,5 +465,6 @@ class BaseActivatableModel(models.Model):
         if force:
             return super(BaseActivatableModel, self).delete(**kwargs)
         else:
-            setattr(self, self.ACTIVATABLE_FIELD_NAME, False)
+            setattr(self, self.ACTIVATABLE_FIELD_NAME, self.ACTIVATION_STATE.get_value(
+                False, getattr(self, self.ACTIVATABLE_FIELD_NAME)))
             return self.save(update_fields=[self.ACTIVATABLE_FIELD_NAME])
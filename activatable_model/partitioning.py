@@ -0,0 +1,228 @@
+from django.db import NotSupportedError
+from django.db.backends.ddl_references import Statement
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+
+from activatable_model.states import BooleanActivationState
+
+
+class PartitionByActivation(Operation):
+    """
+    Partitions the table of an activatable model into an active and an inactive partition by the activatable
+    field, so that queries of active rows only scan the active partition. The model must set
+    PARTITION_BY_ACTIVATION to True.
+
+    On PostgreSQL, the table is rebuilt as a declarative list partitioned table. The rows are copied over and
+    the indexes and foreign keys of the model are recreated. The primary key becomes the pair of the primary
+    key and the activatable field, so other tables cannot have foreign keys to the model and the activatable
+    field cannot be nullable.
+
+    On SQLite, which does not support partitioning, the table is kept and its rows are mirrored into an active
+    and an inactive table by triggers. This only serves testing the partitioning of a model.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name='is_active', activation_state=None):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.activation_state = activation_state or BooleanActivationState()
+
+    def deconstruct(self):
+        kwargs = {
+            'model_name': self.model_name,
+            'field_name': self.field_name,
+            'activation_state': self.activation_state,
+        }
+        return (self.__class__.__name__, [], kwargs)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                # The rebuilt table gets its indexes and foreign keys from the partitioning SQL. Drop the ones that
+                # were deferred to the end of the migration, i.e. by a CreateModel of the same migration, so that
+                # they are only created once
+                schema_editor.deferred_sql = [
+                    sql for sql in schema_editor.deferred_sql
+                    if not (isinstance(sql, Statement) and sql.references_table(model._meta.db_table))
+                ]
+            for sql in get_partition_sql(schema_editor, model, self.field_name, self.activation_state):
+                schema_editor.execute(sql, params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql in get_unpartition_sql(schema_editor, model):
+                schema_editor.execute(sql, params=None)
+
+    def describe(self):
+        return 'Partition {0} by activation'.format(self.model_name)
+
+    @property
+    def migration_name_fragment(self):
+        return 'partition_{0}_by_activation'.format(self.model_name.lower())
+
+
+def get_partition_table_names(schema_editor, model):
+    """
+    Returns the names of the active and inactive partitions of the model.
+    """
+    max_name_length = schema_editor.connection.ops.max_name_length()
+    return (
+        truncate_name('{0}_active'.format(model._meta.db_table), max_name_length),
+        truncate_name('{0}_inactive'.format(model._meta.db_table), max_name_length),
+    )
+
+
+def get_partition_sql(schema_editor, model, field_name, activation_state):
+    """
+    Returns the SQL statements that partition the table of the model by activation state.
+    """
+    qn = schema_editor.quote_name
+    table = model._meta.db_table
+    active_table, inactive_table = get_partition_table_names(schema_editor, model)
+    field = model._meta.get_field(field_name)
+    column = field.column
+
+    # The activatable field becomes part of the primary key, which cannot contain NULL
+    if field.null:
+        raise NotSupportedError('Tables cannot be partitioned by the nullable field {0}'.format(field))
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        old_table = truncate_name('{0}_unpartitioned'.format(table), schema_editor.connection.ops.max_name_length())
+        active_values_sql = activation_state.get_active_partition_values_sql(schema_editor.quote_value)
+        return [
+            'ALTER TABLE {0} RENAME TO {1}'.format(qn(table), qn(old_table)),
+            (
+                'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY '
+                'INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY LIST ({column})'
+            ).format(table=qn(table), old_table=qn(old_table), column=qn(column)),
+            'CREATE TABLE {0} PARTITION OF {1} FOR VALUES IN ({2})'.format(
+                qn(active_table), qn(table), active_values_sql),
+            'CREATE TABLE {0} PARTITION OF {1} DEFAULT'.format(qn(inactive_table), qn(table)),
+        ] + _get_postgresql_move_rows_sql(schema_editor, model, old_table, [model._meta.pk.column, column])
+    elif vendor == 'sqlite':
+        trigger_name = get_partition_trigger_name(schema_editor, model)
+        columns = [field.column for field in model._meta.local_concrete_fields]
+        pk = qn(model._meta.pk.column)
+
+        def get_insert_sql(row_sql, column_sql):
+            active_sql = activation_state.get_active_sql(column_sql, schema_editor.quote_value)
+            return [
+                '{0} WHERE {1}'.format(_get_sqlite_insert_sql(qn, active_table, columns, row_sql), active_sql),
+                '{0} WHERE NOT COALESCE({1}, 0)'.format(
+                    _get_sqlite_insert_sql(qn, inactive_table, columns, row_sql), active_sql),
+            ]
+
+        new_row_insert_sql = '; '.join(get_insert_sql(None, 'NEW.{0}'.format(qn(column))))
+        delete_sql = 'DELETE FROM {0} WHERE {2} = OLD.{2}; DELETE FROM {1} WHERE {2} = OLD.{2}'.format(
+            qn(active_table), qn(inactive_table), pk)
+        return [
+            'CREATE TABLE {0} AS SELECT * FROM {1} WHERE 0'.format(qn(active_table), qn(table)),
+            'CREATE TABLE {0} AS SELECT * FROM {1} WHERE 0'.format(qn(inactive_table), qn(table)),
+            'CREATE UNIQUE INDEX {0} ON {1} ({2})'.format(qn(active_table + '_pk'), qn(active_table), pk),
+            'CREATE UNIQUE INDEX {0} ON {1} ({2})'.format(qn(inactive_table + '_pk'), qn(inactive_table), pk),
+        ] + get_insert_sql('FROM {0}'.format(qn(table)), qn(column)) + [
+            'CREATE TRIGGER {0} AFTER INSERT ON {1} FOR EACH ROW BEGIN {2}; END'.format(
+                qn(trigger_name + '_insert'), qn(table), new_row_insert_sql),
+            'CREATE TRIGGER {0} AFTER UPDATE ON {1} FOR EACH ROW BEGIN {2}; {3}; END'.format(
+                qn(trigger_name + '_update'), qn(table), delete_sql, new_row_insert_sql),
+            'CREATE TRIGGER {0} AFTER DELETE ON {1} FOR EACH ROW BEGIN {2}; END'.format(
+                qn(trigger_name + '_delete'), qn(table), delete_sql),
+        ]
+    else:
+        raise NotSupportedError('Partitioning by activation is not supported on {0}'.format(vendor))
+
+
+def get_unpartition_sql(schema_editor, model):
+    """
+    Returns the SQL statements that turn the partitioned table of the model back into a regular table.
+    """
+    qn = schema_editor.quote_name
+    table = model._meta.db_table
+    active_table, inactive_table = get_partition_table_names(schema_editor, model)
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        old_table = truncate_name('{0}_partitioned'.format(table), schema_editor.connection.ops.max_name_length())
+        return [
+            'ALTER TABLE {0} RENAME TO {1}'.format(qn(table), qn(old_table)),
+            (
+                'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY '
+                'INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+            ).format(table=qn(table), old_table=qn(old_table)),
+        ] + _get_postgresql_move_rows_sql(schema_editor, model, old_table, [model._meta.pk.column])
+    elif vendor == 'sqlite':
+        trigger_name = get_partition_trigger_name(schema_editor, model)
+        return [
+            'DROP TRIGGER IF EXISTS {0}'.format(qn(trigger_name + '_insert')),
+            'DROP TRIGGER IF EXISTS {0}'.format(qn(trigger_name + '_update')),
+            'DROP TRIGGER IF EXISTS {0}'.format(qn(trigger_name + '_delete')),
+            'DROP TABLE IF EXISTS {0}'.format(qn(active_table)),
+            'DROP TABLE IF EXISTS {0}'.format(qn(inactive_table)),
+        ]
+    else:
+        raise NotSupportedError('Partitioning by activation is not supported on {0}'.format(vendor))
+
+
+def get_partition_trigger_name(schema_editor, model):
+    """
+    Returns the name prefix of the SQLite triggers that mirror rows into the partitions, leaving room for the
+    _insert, _update and _delete suffixes.
+    """
+    max_name_length = schema_editor.connection.ops.max_name_length()
+    return truncate_name(
+        '{0}_partition'.format(model._meta.db_table), max_name_length - len('_insert') if max_name_length else None)
+
+
+def _get_sqlite_insert_sql(qn, table, columns, row_sql):
+    """
+    Returns an INSERT ... SELECT statement of the columns from row_sql, or of the NEW row if row_sql is None.
+    """
+    return 'INSERT INTO {table} ({columns}) SELECT {values}{row}'.format(
+        table=qn(table),
+        columns=', '.join(qn(column) for column in columns),
+        values=', '.join(qn(column) if row_sql else 'NEW.{0}'.format(qn(column)) for column in columns),
+        row=' {0}'.format(row_sql) if row_sql else '',
+    )
+
+
+def _get_postgresql_move_rows_sql(schema_editor, model, old_table, primary_key_columns):
+    """
+    Returns the SQL statements that copy the rows of old_table into the new table of the model, hand over the
+    primary key sequence, drop old_table and recreate the primary key, indexes and foreign keys of the model.
+    """
+    qn = schema_editor.quote_name
+    table = model._meta.db_table
+    pk_column = model._meta.pk.column
+    sequence_sql = (
+        'DO $$ DECLARE '
+        'new_sequence text := pg_get_serial_sequence({table_literal}, {pk_literal}); '
+        'old_sequence text := pg_get_serial_sequence({old_table_literal}, {pk_literal}); '
+        'BEGIN '
+        'IF old_sequence IS NULL THEN RETURN; '
+        'ELSIF new_sequence IS NULL THEN '
+        "EXECUTE format('ALTER SEQUENCE %s OWNED BY %s.%I', old_sequence, {table_literal}, {pk_literal}); "
+        'ELSE '
+        "EXECUTE format('SELECT setval(%L, last_value, is_called) FROM %s', new_sequence, old_sequence); "
+        'END IF; '
+        'END $$'
+    ).format(
+        table_literal=schema_editor.quote_value(qn(table)),
+        old_table_literal=schema_editor.quote_value(qn(old_table)),
+        pk_literal=schema_editor.quote_value(pk_column),
+    )
+    return [
+        'INSERT INTO {0} SELECT * FROM {1}'.format(qn(table), qn(old_table)),
+        sequence_sql,
+        'DROP TABLE {0}'.format(qn(old_table)),
+        'ALTER TABLE {0} ADD PRIMARY KEY ({1})'.format(qn(table), ', '.join(qn(c) for c in primary_key_columns)),
+    ] + [str(sql) for sql in schema_editor._model_indexes_sql(model)] + [
+        str(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+        for field in model._meta.local_concrete_fields
+        if field.remote_field and field.db_constraint
+    ]
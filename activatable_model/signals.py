@@ -1,8 +1,280 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_for_futures
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
 from django.dispatch import Signal
 
 
+logger = logging.getLogger(__name__)
+
+
 # providing_args=['instance_ids', 'is_active']
 model_activations_changed = Signal()
 
 # providing_args=['instance_ids', 'is_active']
 model_activations_updated = Signal()
+
+# The receivers registered with on_activated and on_deactivated, keyed on (model, is_active). The values
+# are tuples that are replaced on registration so that sending only does a single dictionary lookup
+activation_receivers = {}
+
+# The receivers registered with inherited=True, keyed on (parent model, is_active). The values map the
+# models that inherit their activation from the parent model to their receivers. Models that only have
+# descendants with receivers map to an empty tuple
+inherited_activation_receivers = {}
+
+# The thread pool that runs independent receivers, created on first use
+_receiver_executor = None
+_receiver_executor_lock = threading.Lock()
+
+# Marks the threads of the receiver thread pool, which run the independent receivers that they wait on inline
+_receiver_thread_state = threading.local()
+
+
+class ActivationReceiversError(Exception):
+    """
+    Raised after all independent receivers finished when any of them raised. errors holds the exceptions.
+    """
+    def __init__(self, errors):
+        super(ActivationReceiversError, self).__init__(
+            '{0} activation receivers raised exceptions: {1}'.format(len(errors), errors))
+        self.errors = errors
+
+
+class RegisteredActivationReceiver(object):
+    """
+    A receiver in the registry along with how it is dispatched. Independent receivers do not depend on other
+    receivers and run concurrently in a bounded thread pool, with the instance ids split into chunks of
+    chunk_size. If wait is True, sending waits for them to finish. Otherwise they are started once the
+    current transaction commits, and their exceptions are logged.
+    """
+    def __init__(self, receiver, independent=False, chunk_size=None, wait=True):
+        self.receiver = receiver
+        self.independent = independent
+        self.chunk_size = chunk_size
+        self.wait = wait
+
+
+def get_receiver_executor():
+    """
+    Returns the thread pool for independent receivers. Its size is the ACTIVATABLE_MODEL_RECEIVER_THREADS
+    setting, which defaults to 4.
+    """
+    global _receiver_executor
+    with _receiver_executor_lock:
+        if _receiver_executor is None:
+            _receiver_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ACTIVATABLE_MODEL_RECEIVER_THREADS', 4),
+                thread_name_prefix='activation_receiver')
+        return _receiver_executor
+
+
+def register_activation_receiver(model, is_active, receiver, independent=False, chunk_size=None, wait=True,
+                                 inherited=False):
+    """
+    Registers a receiver that is called when instances of the model change to the given activation state.
+    If inherited is True and the model inherits its activation from its ACTIVATION_PARENT_FIELD, the
+    receiver is also called with the ids of the active instances of changed ancestors.
+    """
+    registered = RegisteredActivationReceiver(receiver, independent=independent, chunk_size=chunk_size, wait=wait)
+    _add_registered_receiver(activation_receivers, (model, is_active), registered)
+
+    # Register the receiver for the parent of the model, and the path to the model for all other ancestors
+    while inherited and model.ACTIVATION_PARENT_FIELD:
+        parent_model = model._meta.get_field(model.ACTIVATION_PARENT_FIELD).related_model
+        inherited_receivers = inherited_activation_receivers.setdefault((parent_model, is_active), {})
+        if registered is not None:
+            _add_registered_receiver(inherited_receivers, model, registered)
+            registered = None
+        else:
+            inherited_receivers.setdefault(model, ())
+        model = parent_model
+
+
+def _add_registered_receiver(receivers, key, registered):
+    registered_receivers = receivers.get(key, ())
+    if all(r.receiver != registered.receiver for r in registered_receivers):
+        receivers[key] = registered_receivers + (registered,)
+
+
+def unregister_activation_receiver(model, is_active, receiver):
+    key = (model, is_active)
+    activation_receivers[key] = tuple(
+        registered for registered in activation_receivers.get(key, ()) if registered.receiver != receiver)
+    for inherited_receivers in inherited_activation_receivers.values():
+        if model in inherited_receivers:
+            inherited_receivers[model] = tuple(
+                registered for registered in inherited_receivers[model] if registered.receiver != receiver)
+
+
+def on_activated(model, **kwargs):
+    """
+    A decorator that registers a receiver for activations of the model. The receiver is called with the same
+    arguments as model_activations_changed receivers, but only for the model and only when instances of the
+    model were activated. The independent, chunk_size and wait keyword arguments are described in
+    RegisteredActivationReceiver and inherited in register_activation_receiver.
+    """
+    def decorator(receiver):
+        register_activation_receiver(model, True, receiver, **kwargs)
+        return receiver
+    return decorator
+
+
+def on_deactivated(model, **kwargs):
+    """
+    A decorator that registers a receiver for deactivations of the model.
+    """
+    def decorator(receiver):
+        register_activation_receiver(model, False, receiver, **kwargs)
+        return receiver
+    return decorator
+
+
+def _call_receiver(receiver, **kwargs):
+    if asyncio.iscoroutinefunction(receiver):
+        return async_to_sync(receiver)(**kwargs)
+    return receiver(**kwargs)
+
+
+def _call_independent_receiver(receiver, **kwargs):
+    _receiver_thread_state.is_pool_thread = True
+    try:
+        return _call_receiver(receiver, **kwargs)
+    finally:
+        # Pool threads would otherwise keep their database connections open
+        close_old_connections()
+
+
+def _log_receiver_error(future):
+    if future.exception() is not None:
+        logger.error('Activation receiver raised an exception', exc_info=future.exception())
+
+
+def _get_instance_id_chunks(registered, instance_ids):
+    chunk_size = registered.chunk_size or len(instance_ids)
+    return [instance_ids[i:i + chunk_size] for i in range(0, len(instance_ids), chunk_size)]
+
+
+def _submit_independent_receiver(registered, sender, instance_ids, is_active, **kwargs):
+    return [
+        get_receiver_executor().submit(
+            _call_independent_receiver, registered.receiver, sender=sender, instance_ids=chunk,
+            is_active=is_active, **kwargs)
+        for chunk in _get_instance_id_chunks(registered, instance_ids)
+    ]
+
+
+def _run_independent_receiver(registered, sender, instance_ids, is_active, **kwargs):
+    """
+    Starts an independent receiver that is waited on and returns its futures. The chunks are run inline instead
+    on a thread of the receiver thread pool, since waiting on the pool from its own threads deadlocks once all of
+    them are waiting, and while a database connection of the current thread is in a transaction, since receivers
+    on pool threads use their own connections and would wait on the locks held by the transaction. All
+    connections are checked because the sender may have updated the rows on any database.
+    """
+    in_transaction = any(connection.in_atomic_block for connection in connections.all())
+    if not in_transaction and not getattr(_receiver_thread_state, 'is_pool_thread', False):
+        return _submit_independent_receiver(registered, sender, instance_ids, is_active, **kwargs)
+
+    futures = []
+    for chunk in _get_instance_id_chunks(registered, instance_ids):
+        future = Future()
+        try:
+            future.set_result(_call_receiver(
+                registered.receiver, sender=sender, instance_ids=chunk, is_active=is_active, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        futures.append(future)
+    return futures
+
+
+def _submit_fire_and_forget_receiver(registered, sender, instance_ids, is_active, **kwargs):
+    for future in _submit_independent_receiver(registered, sender, instance_ids, is_active, **kwargs):
+        future.add_done_callback(_log_receiver_error)
+
+
+def send_activations_changed(sender, instance_ids, is_active, **kwargs):
+    """
+    Sends model_activations_changed and calls the receivers registered for the sender and activation state.
+    Registered receivers are not called when no instances changed. Independent receivers that are waited on
+    run on other threads outside of transactions, and inline in the sending thread inside of transactions on
+    any database.
+    """
+    responses = model_activations_changed.send(sender, instance_ids=instance_ids, is_active=is_active, **kwargs)
+    if not instance_ids:
+        return responses
+
+    responses.extend(_call_registered_receivers(
+        activation_receivers.get((sender, is_active), ()), sender, instance_ids, is_active, **kwargs))
+    if (sender, is_active) in inherited_activation_receivers:
+        responses.extend(_send_inherited_activations_changed(sender, instance_ids, is_active, True, **kwargs))
+    return responses
+
+
+def _send_inherited_activations_changed(parent_model, parent_instance_ids, is_active, check_ancestors, **kwargs):
+    """
+    Calls the inherited receivers of the descendants of the parent model with the ids of the descendants whose
+    effective activation state changed along with the parents. The ids are only fetched for models that
+    have receivers registered for themselves or their descendants.
+    """
+    responses = []
+    for model, registered_receivers in inherited_activation_receivers.get((parent_model, is_active), {}).items():
+        instance_ids = model.objects.all()._get_inherited_change_ids(
+            parent_instance_ids, check_ancestors=check_ancestors)
+        if instance_ids:
+            responses.extend(_call_registered_receivers(
+                registered_receivers, model, instance_ids, is_active, inherited_from=parent_model, **kwargs))
+            responses.extend(_send_inherited_activations_changed(model, instance_ids, is_active, False, **kwargs))
+    return responses
+
+
+def _start_independent_receivers(futures, registered_receivers, sender, instance_ids, is_active, **kwargs):
+    """
+    Starts the independent receivers and adds the futures of the ones that are waited on to futures as they are
+    started, so that the caller can wait on them even when starting a later one fails.
+    """
+    for registered in registered_receivers:
+        if registered.independent and registered.wait:
+            futures.extend(
+                (registered.receiver, future)
+                for future in _run_independent_receiver(registered, sender, instance_ids, is_active, **kwargs)
+            )
+        elif registered.independent:
+            transaction.on_commit(lambda registered=registered: _submit_fire_and_forget_receiver(
+                registered, sender, instance_ids, is_active, **kwargs))
+
+
+def _call_registered_receivers(registered_receivers, sender, instance_ids, is_active, **kwargs):
+    """
+    Calls the registered receivers and returns their responses. Independent receivers are started first so
+    that they run while the other receivers are called. They are always waited on, even when another receiver
+    raised, and all exceptions are raised together in an ActivationReceiversError.
+    """
+    responses = []
+    futures = []
+    receiver_error = None
+    try:
+        _start_independent_receivers(futures, registered_receivers, sender, instance_ids, is_active, **kwargs)
+        for registered in registered_receivers:
+            if not registered.independent:
+                response = _call_receiver(
+                    registered.receiver, sender=sender, instance_ids=instance_ids, is_active=is_active, **kwargs)
+                responses.append((registered.receiver, response))
+    except Exception as e:
+        receiver_error = e
+    finally:
+        wait_for_futures([future for receiver, future in futures])
+
+    errors = [future.exception() for receiver, future in futures if future.exception() is not None]
+    if receiver_error is not None and not errors:
+        raise receiver_error
+    elif receiver_error is not None:
+        errors.append(receiver_error)
+    if errors:
+        raise ActivationReceiversError(errors)
+    responses.extend((receiver, future.result()) for receiver, future in futures)
+    return responses
@@ -0,0 +1,155 @@
+from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class BaseActivationState(object):
+    """
+    Describes how the activatable field of a model stores its active or inactive state. States translate
+    activation into filters and update values so that bulk activation stays a set-based operation.
+    """
+    # The field classes that can store this activation state
+    field_classes = ()
+
+    def is_valid_field(self, field):
+        return field.__class__ in self.field_classes
+
+    def is_active_value(self, value):
+        """
+        Returns True if the given field value represents an active state.
+        """
+        raise NotImplementedError
+
+    def get_filter(self, field_name, is_active):
+        """
+        Returns a Q object that matches rows in the given activation state.
+        """
+        raise NotImplementedError
+
+    def get_active_sql(self, column_sql, quote_value):
+        """
+        Returns an SQL boolean expression that is true when the column is in an active state. quote_value
+        quotes literal values for the database, and is used in DDL such as triggers that cannot take params.
+        """
+        raise NotImplementedError
+
+    def get_active_partition_values_sql(self, quote_value):
+        """
+        Returns the SQL list of column values that represent the active state. Tables that are partitioned by
+        activation state store rows with these values in the active partition. States that store NULL for
+        active rows cannot be partitioned, since the partition key is part of the primary key.
+        """
+        raise NotImplementedError
+
+    def get_inactive_before_filter(self, field_name, cutoff):
+        """
+        Returns a Q object that matches rows that were deactivated before the cutoff time. Only states that
+        record when rows were deactivated support this.
+        """
+        raise ValueError('{0} does not record when rows were deactivated'.format(self.__class__.__name__))
+
+    def get_value(self, is_active, current_value=None):
+        """
+        Returns the value to store on an instance whose current field value is current_value.
+        """
+        raise NotImplementedError
+
+    def get_update_value(self, field, is_active):
+        """
+        Returns the value or expression used when bulk updating rows to the given activation state.
+        """
+        return Value(self.get_value(is_active), output_field=field)
+
+
+class BooleanActivationState(BaseActivationState):
+    """
+    The default activation state. The activatable field is a BooleanField that is True when active.
+    """
+    field_classes = (models.BooleanField,)
+
+    def is_active_value(self, value):
+        return bool(value)
+
+    def get_filter(self, field_name, is_active):
+        return Q(**{field_name: is_active})
+
+    def get_active_sql(self, column_sql, quote_value):
+        return '({0} = {1})'.format(column_sql, quote_value(True))
+
+    def get_active_partition_values_sql(self, quote_value):
+        return quote_value(True)
+
+    def get_value(self, is_active, current_value=None):
+        return is_active
+
+
+class TimestampActivationState(BaseActivationState):
+    """
+    The activatable field is a nullable DateTimeField (i.e. deactivated_at) that is NULL when active and
+    holds the time of deactivation when inactive. Deactivating rows that are already inactive keeps their
+    original deactivation time so that they can be purged by age.
+    """
+    field_classes = (models.DateTimeField,)
+
+    def is_valid_field(self, field):
+        return super(TimestampActivationState, self).is_valid_field(field) and field.null
+
+    def is_active_value(self, value):
+        return value is None
+
+    def get_filter(self, field_name, is_active):
+        return Q(**{'{0}__isnull'.format(field_name): is_active})
+
+    def get_active_sql(self, column_sql, quote_value):
+        return '({0} IS NULL)'.format(column_sql)
+
+    def get_inactive_before_filter(self, field_name, cutoff):
+        return Q(**{'{0}__lt'.format(field_name): cutoff})
+
+    def get_value(self, is_active, current_value=None):
+        if is_active:
+            return None
+        return current_value or timezone.now()
+
+    def get_update_value(self, field, is_active):
+        if is_active:
+            return Value(None, output_field=field)
+        return Coalesce(F(field.name), Value(timezone.now(), output_field=field), output_field=field)
+
+
+class EnumActivationState(BaseActivationState):
+    """
+    The activatable field is a status field (i.e. a small integer with choices). Rows are active when the
+    field equals active_value. Deactivated rows are set to inactive_value, and every value other than
+    active_value is considered inactive.
+    """
+    field_classes = (
+        models.SmallIntegerField,
+        models.PositiveSmallIntegerField,
+        models.IntegerField,
+        models.PositiveIntegerField,
+        models.CharField,
+    )
+
+    def __init__(self, active_value, inactive_value):
+        self.active_value = active_value
+        self.inactive_value = inactive_value
+
+    def is_active_value(self, value):
+        return value == self.active_value
+
+    def get_filter(self, field_name, is_active):
+        q = Q(**{field_name: self.active_value})
+        return q if is_active else ~q
+
+    def get_active_sql(self, column_sql, quote_value):
+        return '({0} = {1})'.format(column_sql, quote_value(self.active_value))
+
+    def get_active_partition_values_sql(self, quote_value):
+        return quote_value(self.active_value)
+
+    def get_value(self, is_active, current_value=None):
+        return self.active_value if is_active else self.inactive_value
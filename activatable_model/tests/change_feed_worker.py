@@ -0,0 +1,56 @@
+"""
+A process that records and consumes activation changes on a file-backed SQLite database, for testing the
+change feed with multiple processes. It is started with the path of the database and the installed apps
+as JSON, reads one JSON command per line from stdin and writes one JSON response per line to stdout:
+
+* {"command": "migrate"} - migrates the database
+* {"command": "record", "instance_ids": [...], "is_active": ..., "id": ...} - records a change and returns
+  its sequence number. The id is optional and simulates a sequence number that was assigned earlier.
+* {"command": "poll"} - polls the consumer of the process and returns the polled sequence numbers
+"""
+import json
+import sys
+
+
+def main(database_name, installed_apps, default_auto_field):
+    from django.conf import settings
+    settings.configure(
+        SECRET_KEY='*',
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': database_name}},
+        INSTALLED_APPS=installed_apps,
+        DEFAULT_AUTO_FIELD=default_auto_field,
+    )
+
+    import django
+    django.setup()
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+
+    from activatable_model.change_feed.feed import ActivationChangeConsumer, record_activation_changes
+    from activatable_model.change_feed.models import ActivationChange
+    from activatable_model.tests.models import ActivatableModel
+
+    consumer = ActivationChangeConsumer(last_sequence=0)
+    for line in sys.stdin:
+        command = json.loads(line)
+        if command['command'] == 'migrate':
+            call_command('migrate', verbosity=0, skip_checks=True)
+            response = None
+        elif command['command'] == 'record' and command.get('id'):
+            response = ActivationChange.objects.create(
+                id=command['id'], content_type=ContentType.objects.get_for_model(ActivatableModel),
+                instance_ids=command['instance_ids'], is_active=command['is_active'],
+            ).id
+        elif command['command'] == 'record':
+            record_activation_changes(
+                ActivatableModel, instance_ids=command['instance_ids'], is_active=command['is_active'])
+            response = ActivationChange.objects.order_by('-id').first().id
+        else:
+            response = [change.id for change in consumer.poll()]
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], json.loads(sys.argv[2]), sys.argv[3])
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+
+from activatable_model.triggers.operations import InstallActivationTriggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activatable_model_triggers', '0001_initial'),
+        ('tests', '0003_activatablemodelwtimestamp_activatablemodelwstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivatableModelWTriggers',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=False)),
+                ('char_field', models.CharField(max_length=64)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        InstallActivationTriggers('ActivatableModelWTriggers'),
+    ]
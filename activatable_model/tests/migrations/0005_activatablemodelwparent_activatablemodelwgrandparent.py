@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0004_activatablemodelwtriggers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivatableModelWParent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(
+                    null=True, on_delete=django.db.models.deletion.PROTECT, to='tests.activatablemodel')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivatableModelWGrandparent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(
+                    on_delete=django.db.models.deletion.PROTECT, to='tests.activatablemodelwparent')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+
+from activatable_model.partitioning import PartitionByActivation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0005_activatablemodelwparent_activatablemodelwgrandparent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivatableModelWPartitions',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=False)),
+                ('char_field', models.CharField(db_index=True, max_length=64)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        PartitionByActivation('ActivatableModelWPartitions'),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0006_activatablemodelwpartitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivatableModelWMigratedPartitions',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=False)),
+                ('char_field', models.CharField(db_index=True, max_length=64)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
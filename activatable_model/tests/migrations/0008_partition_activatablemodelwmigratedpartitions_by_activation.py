@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations
+
+from activatable_model.partitioning import PartitionByActivation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0007_activatablemodelwmigratedpartitions'),
+    ]
+
+    operations = [
+        PartitionByActivation('ActivatableModelWMigratedPartitions'),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 
 from activatable_model.models import BaseActivatableModel
+from activatable_model.states import EnumActivationState, TimestampActivationState
 
 
 class ActivatableModel(BaseActivatableModel):
@@ -28,3 +29,56 @@ class ActivatableModelWNonDefaultField(BaseActivatableModel):
     ACTIVATABLE_FIELD_NAME = 'active'
     active = models.BooleanField(default=False)
     char_field = models.CharField(max_length=64)
+
+
+class ActivatableModelWTimestamp(BaseActivatableModel):
+    ACTIVATABLE_FIELD_NAME = 'deactivated_at'
+    ACTIVATION_STATE = TimestampActivationState()
+    deactivated_at = models.DateTimeField(null=True, default=None)
+    char_field = models.CharField(max_length=64)
+
+
+class ActivatableModelWStatus(BaseActivatableModel):
+    ACTIVE = 1
+    INACTIVE = 2
+    PENDING = 3
+
+    ACTIVATABLE_FIELD_NAME = 'status'
+    ACTIVATION_STATE = EnumActivationState(active_value=ACTIVE, inactive_value=INACTIVE)
+    status = models.SmallIntegerField(default=PENDING, choices=(
+        (ACTIVE, 'Active'),
+        (INACTIVE, 'Inactive'),
+        (PENDING, 'Pending'),
+    ))
+    char_field = models.CharField(max_length=64)
+
+
+class ActivatableModelWTriggers(BaseActivatableModel):
+    TRACK_ACTIVATIONS_WITH_TRIGGERS = True
+    is_active = models.BooleanField(default=False)
+    char_field = models.CharField(max_length=64)
+
+
+class ActivatableModelWParent(BaseActivatableModel):
+    ACTIVATION_PARENT_FIELD = 'parent'
+    is_active = models.BooleanField(default=True)
+    parent = models.ForeignKey(ActivatableModel, null=True, on_delete=models.PROTECT)
+
+
+class ActivatableModelWGrandparent(BaseActivatableModel):
+    ACTIVATION_PARENT_FIELD = 'parent'
+    is_active = models.BooleanField(default=True)
+    parent = models.ForeignKey(ActivatableModelWParent, on_delete=models.PROTECT)
+
+
+class ActivatableModelWPartitions(BaseActivatableModel):
+    PARTITION_BY_ACTIVATION = True
+    is_active = models.BooleanField(default=False)
+    char_field = models.CharField(max_length=64, db_index=True)
+
+
+# Partitioned in a later migration than the one that creates it
+class ActivatableModelWMigratedPartitions(BaseActivatableModel):
+    PARTITION_BY_ACTIVATION = True
+    is_active = models.BooleanField(default=False)
+    char_field = models.CharField(max_length=64, db_index=True)
@@ -0,0 +1,207 @@
+"""
+A harness that runs overlapping activation operations from several threads against the test database and
+checks that the activation signals of the committed operations are consistent with the final table state.
+"""
+from collections import Counter
+import copy
+import random
+import threading
+import time
+import uuid
+
+from django.db import OperationalError, connections, transaction
+
+from activatable_model.signals import model_activations_changed
+
+
+class ActivationStressResult(object):
+    """
+    The measurements of a stress run.
+    """
+    def __init__(self, initial_states, final_states, changed_signals, num_operations, duration, num_retries,
+                 lock_wait_seconds, errors):
+        self.initial_states = initial_states
+        self.final_states = final_states
+        self.changed_signals = changed_signals
+        self.num_operations = num_operations
+        self.duration = duration
+        self.num_retries = num_retries
+        self.lock_wait_seconds = lock_wait_seconds
+        self.errors = errors
+
+    @property
+    def throughput(self):
+        """
+        The number of completed operations per second.
+        """
+        return self.num_operations / self.duration if self.duration else 0
+
+    @property
+    def inconsistent_ids(self):
+        """
+        The ids whose model_activations_changed signals do not add up to their final state. Every real change
+        flips the state of a row, so the number of deactivation and activation signals of a row can only
+        differ by the change between its initial and final state. Missing and duplicate signals both break
+        this, regardless of the order in which concurrent signals were received.
+        """
+        num_deactivations = Counter()
+        num_activations = Counter()
+        for instance_ids, is_active in self.changed_signals:
+            (num_activations if is_active else num_deactivations).update(instance_ids)
+
+        return set(
+            instance_id for instance_id, final_state in self.final_states.items()
+            if num_deactivations[instance_id] - num_activations[instance_id] != (
+                int(self.initial_states[instance_id]) - int(final_state))
+        )
+
+
+class ActivationStressHarness(object):
+    """
+    Runs num_operations randomly chosen operations on each of num_workers threads against the rows of an
+    activatable model with the given ids. Each operation runs in its own transaction and is retried with
+    backoff when the database reports a lock timeout, busy database or deadlock. The workloads are:
+
+    * bulk - activate() or deactivate() on a random subset of the rows
+    * chunked - activate() or deactivate() on a random subset of the rows in primary key chunks
+    * save - loads a random row, changes its activation state and saves it
+    * delete - loads a random row and deletes it, which deactivates it
+
+    The save and delete workloads load the row before the transaction and keep it across retries, like a form
+    that is saved in a later request, so concurrent changes can make the loaded activation state stale.
+    """
+    workloads = ('bulk', 'chunked', 'save', 'delete')
+    instance_workloads = ('save', 'delete')
+
+    def __init__(self, model, instance_ids, num_workers=4, num_operations=20, chunk_size=5, max_retries=50,
+                 seed=None):
+        self.model = model
+        self.instance_ids = list(instance_ids)
+        self.num_workers = num_workers
+        self.num_operations = num_operations
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._changed_signals = []
+        self._num_completed = 0
+        self._num_retries = 0
+        self._lock_wait_seconds = 0
+        self._errors = []
+
+    def get_states(self):
+        field_name = self.model.ACTIVATABLE_FIELD_NAME
+        return {
+            instance_id: self.model.ACTIVATION_STATE.is_active_value(value)
+            for instance_id, value in self.model.objects.filter(
+                id__in=self.instance_ids).values_list('id', field_name)
+        }
+
+    def run(self, workloads=workloads):
+        """
+        Runs the workers and returns an ActivationStressResult.
+        """
+        initial_states = self.get_states()
+        dispatch_uid = 'activation_stress_{0}'.format(uuid.uuid4())
+        model_activations_changed.connect(
+            self._record_changed_signal, sender=self.model, weak=False, dispatch_uid=dispatch_uid)
+
+        # Each worker gets its own seed so that the operations do not depend on thread scheduling
+        workers = [
+            threading.Thread(target=self._work, args=(workloads, random.Random(self.random.random())))
+            for i in range(self.num_workers)
+        ]
+        start_time = time.monotonic()
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            model_activations_changed.disconnect(sender=self.model, dispatch_uid=dispatch_uid)
+        duration = time.monotonic() - start_time
+
+        return ActivationStressResult(
+            initial_states=initial_states,
+            final_states=self.get_states(),
+            changed_signals=self._changed_signals,
+            num_operations=self._num_completed,
+            duration=duration,
+            num_retries=self._num_retries,
+            lock_wait_seconds=self._lock_wait_seconds,
+            errors=self._errors,
+        )
+
+    def _record_changed_signal(self, sender, instance_ids, is_active, **kwargs):
+        # Signals are sent inside the transaction of the operation, so only the signals of the attempt that
+        # commits are recorded and the signals of rolled back attempts are dropped
+        instance_ids = list(instance_ids)
+        transaction.on_commit(lambda: self._append_changed_signal(instance_ids, is_active))
+
+    def _append_changed_signal(self, instance_ids, is_active):
+        with self._lock:
+            self._changed_signals.append((instance_ids, is_active))
+
+    def _work(self, workloads, worker_random):
+        try:
+            for i in range(self.num_operations):
+                self._run_with_retries(worker_random.choice(workloads), worker_random)
+        finally:
+            connections.close_all()
+
+    def _run_with_retries(self, workload, worker_random):
+        operation = getattr(self, '_run_{0}'.format(workload))
+        is_active = worker_random.random() < 0.5
+        instance_ids = worker_random.sample(self.instance_ids, max(1, len(self.instance_ids) // 2))
+        instance = None
+        for num_retries in range(self.max_retries + 1):
+            attempt_start_time = time.monotonic()
+            try:
+                if workload in self.instance_workloads and instance is None:
+                    instance = self._load_instance(instance_ids[0])
+                with transaction.atomic():
+                    if instance is None:
+                        operation(instance_ids, is_active)
+                    else:
+                        # Failed saves still update the in-memory state, so each attempt saves a copy of the
+                        # loaded instance
+                        operation(copy.copy(instance), is_active)
+            except OperationalError as e:
+                # Back off and retry operations that failed on locks
+                backoff = worker_random.uniform(0, 0.001 * 2 ** min(num_retries, 6))
+                time.sleep(backoff)
+                with self._lock:
+                    self._lock_wait_seconds += time.monotonic() - attempt_start_time
+                    if num_retries == self.max_retries:
+                        self._errors.append(e)
+                    else:
+                        self._num_retries += 1
+            else:
+                with self._lock:
+                    self._num_completed += 1
+                return
+
+    def _update(self, queryset, is_active):
+        if is_active:
+            queryset.activate()
+        else:
+            queryset.deactivate()
+
+    def _run_bulk(self, instance_ids, is_active):
+        self._update(self.model.objects.filter(id__in=instance_ids), is_active)
+
+    def _run_chunked(self, instance_ids, is_active):
+        for pks in self.model.objects.filter(id__in=instance_ids)._iter_pk_chunks(self.chunk_size):
+            self._update(self.model.objects.filter(id__in=pks), is_active)
+
+    def _load_instance(self, instance_id):
+        return self.model.objects.get(id=instance_id)
+
+    def _run_save(self, instance, is_active):
+        setattr(instance, self.model.ACTIVATABLE_FIELD_NAME, self.model.ACTIVATION_STATE.get_value(
+            is_active, getattr(instance, self.model.ACTIVATABLE_FIELD_NAME)))
+        instance.save()
+
+    def _run_delete(self, instance, is_active):
+        instance.delete()
@@ -1,22 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.admin import AdminSite
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.test import TestCase, TransactionTestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import NotSupportedError, OperationalError, connection, models, transaction
+from django.db.backends.ddl_references import Statement, Table
+from django.db.models import Case, F, Q, Value, When
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django_dynamic_fixture import G
+from manager_utils import ManagerUtilsQuerySet
 from mock import patch, MagicMock, call
 
+import activatable_model
+from activatable_model.admin import ActivatableModelAdmin, ActivationStateListFilter
+from activatable_model.change_feed.feed import ActivationChangeConsumer, prune_activation_changes
+from activatable_model.change_feed.models import ActivationChange
 from activatable_model.models import BaseActivatableModel
-from activatable_model.signals import model_activations_changed, model_activations_updated
+from activatable_model.partitioning import PartitionByActivation, get_partition_sql, get_unpartition_sql
+from activatable_model.signals import (
+    ActivationReceiversError, activation_receivers, inherited_activation_receivers, model_activations_changed,
+    model_activations_updated, on_activated, on_deactivated, register_activation_receiver,
+    send_activations_changed, unregister_activation_receiver,
+)
+from activatable_model.states import BooleanActivationState, EnumActivationState, TimestampActivationState
+from activatable_model.triggers.drain import drain_activation_changes
+from activatable_model.triggers.models import TriggeredActivationChange
+from activatable_model.triggers.operations import (
+    InstallActivationTriggers, get_install_trigger_sql, get_uninstall_trigger_sql,
+)
 from activatable_model.validation import get_activatable_models, validate_activatable_models
+from activatable_model.tests.stress import ActivationStressHarness, ActivationStressResult
 from activatable_model.tests.models import (
     ActivatableModel,
     ActivatableModelWRel,
     Rel,
     ActivatableModelWNonDefaultField,
     ActivatableModelWRelAndCascade,
+    ActivatableModelWTimestamp,
+    ActivatableModelWStatus,
+    ActivatableModelWTriggers,
+    ActivatableModelWParent,
+    ActivatableModelWGrandparent,
+    ActivatableModelWPartitions,
+    ActivatableModelWMigratedPartitions,
 )
 
 
+class OtherDatabaseRouter(object):
+    """
+    Routes the queries of ActivatableModel to the other database.
+    """
+    def db_for_read(self, model, **hints):
+        return 'other' if model is ActivatableModel else None
+
+    def db_for_write(self, model, **hints):
+        return 'other' if model is ActivatableModel else None
+
+
 class BaseMockActivationsSignalHanderTest(TestCase):
     """
     Connects a mock to the model_activations_changed signal so that it can be easily tested.
@@ -83,6 +138,41 @@ class ManagerQuerySetTest(BaseMockActivationsSignalHanderTest):
         self.assertEquals(set(call_args[1]['instance_ids']), set([m1.id, m2.id]))
         self.assertEquals(call_args[1]['sender'], ActivatableModel)
 
+    def test_update_w_value(self):
+        m1 = G(ActivatableModel, is_active=True)
+        G(ActivatableModel, is_active=False)
+        ActivatableModel.objects.update(is_active=Value(False))
+        self.assertFalse(ActivatableModel.objects.filter(is_active=True).exists())
+
+        call_args = self.mock_model_activations_changed_handler.call_args
+        self.assertEquals(call_args[1]['is_active'], False)
+        self.assertEquals(call_args[1]['instance_ids'], [m1.id])
+
+    def test_update_w_unchanged_expression(self):
+        m = G(ActivatableModel, is_active=False)
+        self.mock_model_activations_changed_handler.reset_mock()
+        self.mock_model_activations_updated_handler.reset_mock()
+
+        ActivatableModel.objects.filter(id=m.id).update(is_active=F('is_active'))
+        self.assertFalse(ActivatableModel.objects.get(id=m.id).is_active)
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_changed, instance_ids=[], is_active=False)
+        self.mock_model_activations_updated_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_updated, instance_ids=[m.id], is_active=False)
+
+    def test_update_w_expression(self):
+        m1 = G(ActivatableModel, is_active=True)
+        m2 = G(ActivatableModel, is_active=False)
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        # Each row changes to a different state, which is signaled per direction
+        ActivatableModel.objects.update(is_active=Case(When(is_active=True, then=Value(False)), default=Value(True)))
+        self.assertEquals(list(ActivatableModel.objects.active()), [m2])
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args_list, [
+            call(sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m2.id], is_active=True),
+            call(sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m1.id], is_active=False),
+        ])
+
     def test_update_w_is_active_custom(self):
         m1 = G(ActivatableModelWNonDefaultField, active=False)
         m2 = G(ActivatableModelWNonDefaultField, active=False)
@@ -216,6 +306,1381 @@ class ManagerQuerySetTest(BaseMockActivationsSignalHanderTest):
         self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
 
 
+class TimestampActivationStateTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests activatable models that store their activation state as a nullable deactivation timestamp.
+    """
+    def test_create(self):
+        m = G(ActivatableModelWTimestamp, deactivated_at=None)
+        call_args = self.mock_model_activations_changed_handler.call_args
+        self.assertEquals(call_args[1]['is_active'], True)
+        self.assertEquals(call_args[1]['instance_ids'], [m.id])
+
+    def test_active_inactive(self):
+        m1 = G(ActivatableModelWTimestamp, deactivated_at=None)
+        m2 = G(ActivatableModelWTimestamp, deactivated_at=timezone.now())
+        self.assertEquals(list(ActivatableModelWTimestamp.objects.active()), [m1])
+        self.assertEquals(list(ActivatableModelWTimestamp.objects.inactive()), [m2])
+
+    def test_deactivate_keeps_original_timestamp(self):
+        deactivated_at = timezone.now() - timedelta(days=30)
+        m1 = G(ActivatableModelWTimestamp, deactivated_at=None)
+        m2 = G(ActivatableModelWTimestamp, deactivated_at=deactivated_at)
+        ActivatableModelWTimestamp.objects.deactivate()
+
+        self.assertIsNotNone(ActivatableModelWTimestamp.objects.get(id=m1.id).deactivated_at)
+        self.assertEquals(ActivatableModelWTimestamp.objects.get(id=m2.id).deactivated_at, deactivated_at)
+        changed_kwargs = self.mock_model_activations_changed_handler.call_args[1]
+        self.assertEquals(changed_kwargs['is_active'], False)
+        self.assertEquals(changed_kwargs['instance_ids'], [m1.id])
+        updated_kwargs = self.mock_model_activations_updated_handler.call_args[1]
+        self.assertEquals(set(updated_kwargs['instance_ids']), set([m1.id, m2.id]))
+
+    def test_activate(self):
+        G(ActivatableModelWTimestamp, deactivated_at=None)
+        m = G(ActivatableModelWTimestamp, deactivated_at=timezone.now())
+        ActivatableModelWTimestamp.objects.activate()
+
+        self.assertFalse(ActivatableModelWTimestamp.objects.inactive().exists())
+        changed_kwargs = self.mock_model_activations_changed_handler.call_args[1]
+        self.assertEquals(changed_kwargs['is_active'], True)
+        self.assertEquals(changed_kwargs['instance_ids'], [m.id])
+
+    def test_update_w_timestamp(self):
+        m = G(ActivatableModelWTimestamp, deactivated_at=None)
+        ActivatableModelWTimestamp.objects.update(deactivated_at=timezone.now())
+
+        changed_kwargs = self.mock_model_activations_changed_handler.call_args[1]
+        self.assertEquals(changed_kwargs['is_active'], False)
+        self.assertEquals(changed_kwargs['instance_ids'], [m.id])
+
+    def test_save_new_timestamp_not_changed(self):
+        m = G(ActivatableModelWTimestamp, deactivated_at=timezone.now())
+        m.deactivated_at = timezone.now()
+        m.save()
+
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 1)
+        self.assertEquals(self.mock_model_activations_updated_handler.call_count, 2)
+
+    def test_delete_no_force(self):
+        m = G(ActivatableModelWTimestamp, deactivated_at=None)
+        m.delete()
+
+        self.assertIsNotNone(ActivatableModelWTimestamp.objects.get(id=m.id).deactivated_at)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['is_active'], False)
+
+
+class EnumActivationStateTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests activatable models that store their activation state in a status field.
+    """
+    def test_active_inactive(self):
+        m1 = G(ActivatableModelWStatus, status=ActivatableModelWStatus.ACTIVE)
+        m2 = G(ActivatableModelWStatus, status=ActivatableModelWStatus.INACTIVE)
+        m3 = G(ActivatableModelWStatus, status=ActivatableModelWStatus.PENDING)
+        self.assertEquals(list(ActivatableModelWStatus.objects.active()), [m1])
+        self.assertEquals(set(ActivatableModelWStatus.objects.inactive()), set([m2, m3]))
+
+    def test_deactivate(self):
+        m1 = G(ActivatableModelWStatus, status=ActivatableModelWStatus.ACTIVE)
+        m2 = G(ActivatableModelWStatus, status=ActivatableModelWStatus.PENDING)
+        ActivatableModelWStatus.objects.deactivate()
+
+        self.assertEquals(
+            ActivatableModelWStatus.objects.filter(status=ActivatableModelWStatus.INACTIVE).count(), 2)
+        changed_kwargs = self.mock_model_activations_changed_handler.call_args[1]
+        self.assertEquals(changed_kwargs['is_active'], False)
+        self.assertEquals(changed_kwargs['instance_ids'], [m1.id])
+        updated_kwargs = self.mock_model_activations_updated_handler.call_args[1]
+        self.assertEquals(set(updated_kwargs['instance_ids']), set([m1.id, m2.id]))
+
+    def test_activate(self):
+        G(ActivatableModelWStatus, status=ActivatableModelWStatus.ACTIVE)
+        m = G(ActivatableModelWStatus, status=ActivatableModelWStatus.PENDING)
+        ActivatableModelWStatus.objects.activate()
+
+        self.assertFalse(ActivatableModelWStatus.objects.inactive().exists())
+        changed_kwargs = self.mock_model_activations_changed_handler.call_args[1]
+        self.assertEquals(changed_kwargs['is_active'], True)
+        self.assertEquals(changed_kwargs['instance_ids'], [m.id])
+
+    def test_save_changed(self):
+        m = G(ActivatableModelWStatus, status=ActivatableModelWStatus.PENDING)
+        m.status = ActivatableModelWStatus.INACTIVE
+        m.save()
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 1)
+
+        m.status = ActivatableModelWStatus.ACTIVE
+        m.save()
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['is_active'], True)
+
+    def test_delete_no_force(self):
+        m = G(ActivatableModelWStatus, status=ActivatableModelWStatus.ACTIVE)
+        m.delete()
+        self.assertEquals(ActivatableModelWStatus.objects.get(id=m.id).status, ActivatableModelWStatus.INACTIVE)
+
+
+class ActivationResultTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests returning an ActivationResult from bulk activation and deactivation.
+    """
+    def test_deactivate_return_result(self):
+        m1 = G(ActivatableModel, is_active=True)
+        m2 = G(ActivatableModel, is_active=False)
+        m3 = G(ActivatableModel, is_active=True)
+
+        result = ActivatableModel.objects.deactivate(return_result=True)
+        self.assertFalse(result.is_active)
+        self.assertEquals(result.num_updated_rows, 3)
+        self.assertEquals(result.changed_count, 2)
+        self.assertEquals(result.updated_count, 3)
+        self.assertEquals(list(result), [m1, m3])
+        self.assertFalse(any(m.is_active for m in result))
+
+        with self.assertNumQueries(2):
+            self.assertEquals(list(result.iterator(chunk_size=2, changed_only=False)), [m1, m2, m3])
+
+    def test_activate_return_result(self):
+        m = G(ActivatableModel, is_active=False)
+
+        result = ActivatableModel.objects.filter(id=m.id).activate(return_result=True)
+        self.assertTrue(result.is_active)
+        self.assertEquals([m.is_active for m in result], [True])
+
+    def test_return_result_database(self):
+        m = G(ActivatableModel, is_active=True)
+        result = ActivatableModel.objects.using('default').deactivate(return_result=True)
+        self.assertEquals(result.db, 'default')
+
+        with patch.object(ActivatableModel._default_manager, 'using', return_value=ActivatableModel.objects.all()) as (
+            mock_using
+        ):
+            result.db = 'other'
+            self.assertEquals(list(result), [m])
+        mock_using.assert_called_once_with('other')
+
+    def test_return_result_no_rows(self):
+        result = ActivatableModel.objects.activate(return_result=True)
+        self.assertEquals(result.changed_count, 0)
+        self.assertEquals(list(result), [])
+
+
+class SetActiveTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests activating some rows of a queryset and deactivating the rest in one statement.
+    """
+    def test_set_active(self):
+        m1 = G(ActivatableModel, is_active=False, char_field='group')
+        m2 = G(ActivatableModel, is_active=True, char_field='group')
+        m3 = G(ActivatableModel, is_active=True, char_field='group')
+        m4 = G(ActivatableModel, is_active=True, char_field='other')
+        self.mock_model_activations_changed_handler.reset_mock()
+        self.mock_model_activations_updated_handler.reset_mock()
+
+        # One select and one update, plus a change feed insert for each direction
+        with self.assertNumQueries(4):
+            self.assertEquals(ActivatableModel.objects.filter(char_field='group').set_active([m1.id, m2.id]), 3)
+
+        self.assertEquals(set(ActivatableModel.objects.active()), set([m1, m2, m4]))
+        static_kwargs = {
+            'sender': ActivatableModel,
+            'signal': model_activations_changed,
+        }
+        self.mock_model_activations_changed_handler.assert_has_calls([
+            call(instance_ids=[m1.id], is_active=True, **static_kwargs),
+            call(instance_ids=[m3.id], is_active=False, **static_kwargs),
+        ])
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        static_kwargs['signal'] = model_activations_updated
+        self.mock_model_activations_updated_handler.assert_has_calls([
+            call(instance_ids=[m1.id, m2.id], is_active=True, **static_kwargs),
+            call(instance_ids=[m3.id], is_active=False, **static_kwargs),
+        ])
+
+    def test_set_active_none(self):
+        m = G(ActivatableModel, is_active=True)
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        ActivatableModel.objects.set_active([])
+        self.assertFalse(ActivatableModel.objects.active().exists())
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m.id], is_active=False)
+
+    def test_set_active_where_timestamp(self):
+        deactivated_at = timezone.now() - timedelta(days=30)
+        m1 = G(ActivatableModelWTimestamp, deactivated_at=deactivated_at, char_field='a')
+        m2 = G(ActivatableModelWTimestamp, deactivated_at=deactivated_at, char_field='b')
+        m3 = G(ActivatableModelWTimestamp, deactivated_at=None, char_field='b')
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        ActivatableModelWTimestamp.objects.set_active_where(Q(char_field='a'))
+        self.assertIsNone(ActivatableModelWTimestamp.objects.get(id=m1.id).deactivated_at)
+        self.assertEquals(ActivatableModelWTimestamp.objects.get(id=m2.id).deactivated_at, deactivated_at)
+        self.assertIsNotNone(ActivatableModelWTimestamp.objects.get(id=m3.id).deactivated_at)
+        static_kwargs = {
+            'sender': ActivatableModelWTimestamp,
+            'signal': model_activations_changed,
+        }
+        self.mock_model_activations_changed_handler.assert_has_calls([
+            call(instance_ids=[m1.id], is_active=True, **static_kwargs),
+            call(instance_ids=[m3.id], is_active=False, **static_kwargs),
+        ])
+
+    def test_set_active_where_empty_queryset(self):
+        self.assertEquals(ActivatableModel.objects.set_active_where(Q(char_field='a')), 0)
+        self.assertFalse(self.mock_model_activations_changed_handler.called)
+
+
+class PurgeInactiveTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests hard deleting inactive rows in chunks.
+    """
+    def test_purge_inactive(self):
+        active = G(ActivatableModel, is_active=True)
+        G(ActivatableModel, is_active=False)
+        G(ActivatableModel, is_active=False)
+
+        self.assertEquals(ActivatableModel.objects.purge_inactive(chunk_size=1), 2)
+        self.assertEquals(list(ActivatableModel.objects.all()), [active])
+
+    def test_purge_inactive_queryset(self):
+        G(ActivatableModel, is_active=False, char_field='keep')
+        G(ActivatableModel, is_active=False, char_field='purge')
+
+        self.assertEquals(ActivatableModel.objects.filter(char_field='purge').purge_inactive(), 1)
+        self.assertEquals(ActivatableModel.objects.get().char_field, 'keep')
+
+    def test_purge_inactive_older_than(self):
+        G(ActivatableModelWTimestamp, deactivated_at=None)
+        G(ActivatableModelWTimestamp, deactivated_at=timezone.now() - timedelta(days=10))
+        old = G(ActivatableModelWTimestamp, deactivated_at=timezone.now() - timedelta(days=40))
+
+        self.assertEquals(ActivatableModelWTimestamp.objects.purge_inactive(older_than=timedelta(days=30)), 1)
+        self.assertEquals(ActivatableModelWTimestamp.objects.count(), 2)
+        self.assertFalse(ActivatableModelWTimestamp.objects.filter(id=old.id).exists())
+
+    def test_purge_inactive_older_than_datetime(self):
+        G(ActivatableModelWTimestamp, deactivated_at=timezone.now() - timedelta(days=40))
+        self.assertEquals(ActivatableModelWTimestamp.objects.purge_inactive(
+            older_than=timezone.now() - timedelta(days=30)), 1)
+
+    def test_purge_inactive_older_than_not_supported(self):
+        G(ActivatableModel, is_active=False)
+        with self.assertRaises(ValueError):
+            ActivatableModel.objects.purge_inactive(older_than=timedelta(days=30))
+
+    def test_purge_inactive_dry_run(self):
+        G(ActivatableModel, is_active=False)
+        G(ActivatableModel, is_active=False)
+
+        self.assertEquals(ActivatableModel.objects.purge_inactive(chunk_size=1, dry_run=True), 2)
+        self.assertEquals(ActivatableModel.objects.count(), 2)
+
+    @patch('activatable_model.models.time.sleep')
+    def test_purge_inactive_throttle(self, mock_sleep):
+        for i in range(3):
+            G(ActivatableModel, is_active=False)
+
+        self.assertEquals(ActivatableModel.objects.purge_inactive(chunk_size=2, throttle=0.5), 3)
+        self.assertEquals(mock_sleep.call_args_list, [call(0.5)])
+
+    def test_purge_inactive_command(self):
+        G(ActivatableModelWTimestamp, deactivated_at=timezone.now() - timedelta(days=40))
+        out = StringIO()
+        call_command(
+            'purge_inactive', 'tests.ActivatableModelWTimestamp', '--older-than-days', '30', '--dry-run',
+            stdout=out)
+        self.assertEquals(out.getvalue().strip(), 'Would purge 1 inactive tests.ActivatableModelWTimestamp rows')
+
+        call_command('purge_inactive', 'tests.ActivatableModelWTimestamp', '--chunk-size', '10', stdout=out)
+        self.assertFalse(ActivatableModelWTimestamp.objects.exists())
+
+    def test_purge_inactive_command_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_inactive', 'tests.Missing')
+        with self.assertRaises(CommandError):
+            call_command('purge_inactive', 'tests.Rel')
+        with self.assertRaises(CommandError):
+            call_command('purge_inactive', 'tests.ActivatableModel', '--older-than-days', '30')
+
+
+class ChangeFeedTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests recording activation changes to the change feed and consuming them.
+    """
+    def test_record_save(self):
+        m = G(ActivatableModel, is_active=False)
+        change = ActivationChange.objects.get()
+        self.assertEquals(change.content_type, ContentType.objects.get_for_model(ActivatableModel))
+        self.assertEquals(change.instance_ids, [m.id])
+        self.assertFalse(change.is_active)
+
+    def test_record_no_changes(self):
+        G(ActivatableModel, is_active=True)
+        ActivatableModel.objects.activate()
+        self.assertEquals(ActivationChange.objects.count(), 1)
+
+    @override_settings(ACTIVATABLE_MODEL_CHANGE_FEED_BATCH_SIZE=2)
+    def test_record_update_batches(self):
+        ids = [G(ActivatableModel, is_active=True).id for i in range(3)]
+        ActivationChange.objects.all().delete()
+
+        ActivatableModel.objects.deactivate()
+        changes = list(ActivationChange.objects.order_by('id'))
+        self.assertEquals(len(changes), 2)
+        self.assertEquals(set(changes[0].instance_ids + changes[1].instance_ids), set(ids))
+        self.assertFalse(any(change.is_active for change in changes))
+
+    def test_consumer_starts_at_end(self):
+        G(ActivatableModel, is_active=False)
+        consumer = ActivationChangeConsumer()
+        self.assertEquals(consumer.poll(), [])
+        self.assertEquals(consumer.poll(), [])
+
+        m = G(ActivatableModel, is_active=True)
+        changes = consumer.poll()
+        self.assertEquals([change.instance_ids for change in changes], [[m.id]])
+        self.assertEquals(consumer.last_sequence, changes[0].id)
+
+    def test_consumer_empty_feed(self):
+        consumer = ActivationChangeConsumer()
+        consumer.poll()
+        self.assertEquals(consumer.last_sequence, 0)
+
+    def test_consumers_poll_independently(self):
+        m1 = G(ActivatableModel, is_active=True)
+        m2 = G(ActivatableModel, is_active=True)
+        consumer1 = ActivationChangeConsumer(last_sequence=0, batch_size=1)
+        consumer2 = ActivationChangeConsumer(last_sequence=0)
+
+        self.assertEquals([change.instance_ids for change in consumer1.poll()], [[m1.id]])
+        self.assertEquals([change.instance_ids for change in consumer2.poll()], [[m1.id], [m2.id]])
+        self.assertEquals([change.instance_ids for change in consumer1.poll()], [[m2.id]])
+        self.assertEquals(consumer1.poll(), [])
+
+    def test_consumer_dispatch(self):
+        consumer = ActivationChangeConsumer(last_sequence=0)
+        m = G(ActivatableModel, is_active=True)
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        self.assertEquals(consumer.dispatch(), 1)
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m.id], is_active=True,
+            change_sequence=ActivationChange.objects.get().id)
+        # Dispatched changes are not recorded again
+        self.assertEquals(ActivationChange.objects.count(), 1)
+        self.assertEquals(consumer.dispatch(), 0)
+
+    def test_prune(self):
+        G(ActivatableModel, is_active=True)
+        G(ActivatableModel, is_active=True)
+        ActivationChange.objects.filter(id=ActivationChange.objects.order_by('id').first().id).update(
+            time=timezone.now() - timedelta(days=2))
+
+        self.assertEquals(prune_activation_changes(timedelta(days=1)), 1)
+        self.assertEquals(ActivationChange.objects.count(), 1)
+
+    def test_consumer_polls_late_commits(self):
+        content_type = ContentType.objects.get_for_model(ActivatableModel)
+        consumer = ActivationChangeConsumer(last_sequence=0)
+        ActivationChange.objects.create(id=1, content_type=content_type, instance_ids=[1], is_active=True)
+        # Sequence number 2 is assigned to a transaction that commits after sequence number 3
+        ActivationChange.objects.create(id=3, content_type=content_type, instance_ids=[3], is_active=True)
+        self.assertEquals([change.id for change in consumer.poll()], [1, 3])
+        self.assertEquals(set(consumer.gaps), {2})
+
+        ActivationChange.objects.create(id=2, content_type=content_type, instance_ids=[2], is_active=True)
+        self.assertEquals([change.id for change in consumer.poll()], [2])
+        self.assertEquals(consumer.gaps, {})
+        self.assertEquals(consumer.last_sequence, 3)
+        self.assertEquals(consumer.poll(), [])
+
+    def test_consumer_gap_timeout(self):
+        content_type = ContentType.objects.get_for_model(ActivatableModel)
+        consumer = ActivationChangeConsumer(last_sequence=0, gap_timeout=timedelta(0))
+        ActivationChange.objects.create(id=2, content_type=content_type, instance_ids=[2], is_active=True)
+        self.assertEquals([change.id for change in consumer.poll()], [2])
+
+        # Gaps that are older than the timeout are assumed to be rolled back
+        ActivationChange.objects.create(id=1, content_type=content_type, instance_ids=[1], is_active=True)
+        self.assertEquals(consumer.poll(), [])
+        self.assertEquals(consumer.gaps, {})
+
+
+class ChangeFeedProcessTest(TestCase):
+    """
+    Tests recording and consuming the change feed in separate processes with a file-backed SQLite database.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.database_name = os.path.join(self.temp_dir.name, 'change_feed.sqlite3')
+
+    def start_worker(self):
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(activatable_model.__file__)))
+        worker = subprocess.Popen(
+            [
+                sys.executable, '-m', 'activatable_model.tests.change_feed_worker', self.database_name,
+                json.dumps(list(settings.INSTALLED_APPS)), settings.DEFAULT_AUTO_FIELD,
+            ],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+            env=dict(os.environ, PYTHONPATH=package_dir),
+        )
+
+        def stop_worker():
+            worker.stdin.close()
+            worker.wait(timeout=30)
+            worker.stdout.close()
+        self.addCleanup(stop_worker)
+        return worker
+
+    def send(self, worker, command, **kwargs):
+        worker.stdin.write(json.dumps(dict(kwargs, command=command)) + '\n')
+        worker.stdin.flush()
+        return json.loads(worker.stdout.readline())
+
+    def test_record_and_consume_in_separate_processes(self):
+        consumer = self.start_worker()
+        producer = self.start_worker()
+        self.send(consumer, 'migrate')
+
+        sequence = self.send(producer, 'record', instance_ids=[1], is_active=False)
+        self.assertEquals(self.send(consumer, 'poll'), [sequence])
+
+        # A transaction that was assigned the next sequence number commits after a later one. SQLite
+        # serializes writers, so the earlier sequence number is assigned explicitly
+        self.send(producer, 'record', instance_ids=[3], is_active=False, id=sequence + 2)
+        self.assertEquals(self.send(consumer, 'poll'), [sequence + 2])
+        self.send(producer, 'record', instance_ids=[2], is_active=False, id=sequence + 1)
+        self.assertEquals(self.send(consumer, 'poll'), [sequence + 1])
+        self.assertEquals(self.send(consumer, 'poll'), [])
+
+
+class TriggerTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests tracking activation changes with database triggers and draining them.
+    """
+    def get_changes(self):
+        return list(TriggeredActivationChange.objects.order_by('id').values_list('instance_id', 'is_active'))
+
+    def test_create(self):
+        m = G(ActivatableModelWTriggers, is_active=True)
+        self.assertFalse(self.mock_model_activations_changed_handler.called)
+        self.assertFalse(self.mock_model_activations_updated_handler.called)
+        self.assertEquals(self.get_changes(), [(m.id, True)])
+
+    def test_save(self):
+        m = G(ActivatableModelWTriggers, is_active=True)
+        m.char_field = 'hi'
+        m.save()
+        m.is_active = True
+        m.save()
+        m.delete()
+        self.assertEquals(self.get_changes(), [(m.id, True), (m.id, False)])
+        self.assertFalse(self.mock_model_activations_changed_handler.called)
+
+    def test_raw_sql(self):
+        m1 = G(ActivatableModelWTriggers, is_active=True)
+        m2 = G(ActivatableModelWTriggers, is_active=False)
+        TriggeredActivationChange.objects.all().delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE {0} SET {1} = %s'.format(
+                connection.ops.quote_name(ActivatableModelWTriggers._meta.db_table),
+                connection.ops.quote_name('is_active')), [False])
+        self.assertEquals(self.get_changes(), [(m1.id, False)])
+
+        self.assertEquals(drain_activation_changes(), 1)
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModelWTriggers, signal=model_activations_changed, instance_ids=[m1.id],
+            is_active=False)
+        self.assertFalse(TriggeredActivationChange.objects.exists())
+        self.assertTrue(ActivatableModelWTriggers.objects.filter(id=m2.id).exists())
+
+    def test_deactivate_does_not_fetch_instances(self):
+        G(ActivatableModelWTriggers, is_active=True)
+        G(ActivatableModelWTriggers, is_active=False)
+
+        with self.assertNumQueries(1):
+            self.assertEquals(ActivatableModelWTriggers.objects.deactivate(), 2)
+        self.assertFalse(self.mock_model_activations_changed_handler.called)
+        self.assertEquals(len(self.get_changes()), 3)
+
+    def test_deactivate_return_result(self):
+        m = G(ActivatableModelWTriggers, is_active=True)
+
+        result = ActivatableModelWTriggers.objects.deactivate(return_result=True)
+        self.assertEquals(list(result), [m])
+        self.assertFalse(self.mock_model_activations_changed_handler.called)
+
+    def test_set_active(self):
+        m1 = G(ActivatableModelWTriggers, is_active=False)
+        m2 = G(ActivatableModelWTriggers, is_active=True)
+        TriggeredActivationChange.objects.all().delete()
+
+        with self.assertNumQueries(1):
+            ActivatableModelWTriggers.objects.set_active([m1.id])
+        self.assertEquals(set(self.get_changes()), set([(m1.id, True), (m2.id, False)]))
+
+    def test_drain_runs_in_order(self):
+        m1 = G(ActivatableModelWTriggers, is_active=True)
+        m2 = G(ActivatableModelWTriggers, is_active=True)
+        m1.delete()
+        TriggeredActivationChange.objects.create(model_table='missing_table', instance_id=1, is_active=True)
+
+        self.assertEquals(drain_activation_changes(batch_size=2), 4)
+        static_kwargs = {
+            'sender': ActivatableModelWTriggers,
+            'signal': model_activations_changed,
+        }
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args_list, [
+            call(instance_ids=[m1.id, m2.id], is_active=True, **static_kwargs),
+            call(instance_ids=[m1.id], is_active=False, **static_kwargs),
+        ])
+
+    def test_drain_max_batches(self):
+        G(ActivatableModelWTriggers, is_active=True)
+        G(ActivatableModelWTriggers, is_active=True)
+
+        self.assertEquals(drain_activation_changes(batch_size=1, max_batches=1), 1)
+        self.assertEquals(TriggeredActivationChange.objects.count(), 1)
+
+    def test_drain_receiver_error(self):
+        G(ActivatableModelWTriggers, is_active=True)
+        self.mock_model_activations_changed_handler.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            drain_activation_changes()
+        self.assertEquals(TriggeredActivationChange.objects.count(), 1)
+
+    def test_drain_command(self):
+        G(ActivatableModelWTriggers, is_active=True)
+        out = StringIO()
+        call_command('drain_activation_changes', '--batch-size', '10', stdout=out)
+        self.assertEquals(out.getvalue().strip(), 'Drained 1 activation changes')
+
+    def test_uninstall_and_install(self):
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for sql in get_uninstall_trigger_sql(schema_editor, ActivatableModelWTriggers):
+                cursor.execute(sql)
+            G(ActivatableModelWTriggers, is_active=True)
+            self.assertFalse(TriggeredActivationChange.objects.exists())
+
+            for sql in get_install_trigger_sql(
+                schema_editor, ActivatableModelWTriggers, 'is_active', BooleanActivationState()
+            ):
+                cursor.execute(sql)
+            G(ActivatableModelWTriggers, is_active=True)
+            self.assertTrue(TriggeredActivationChange.objects.exists())
+
+    def test_unsupported_vendor(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = 'oracle'
+        schema_editor.connection.ops.max_name_length.return_value = 30
+        with self.assertRaises(NotSupportedError):
+            get_install_trigger_sql(schema_editor, ActivatableModelWTriggers, 'is_active', BooleanActivationState())
+        with self.assertRaises(NotSupportedError):
+            get_uninstall_trigger_sql(schema_editor, ActivatableModelWTriggers)
+
+    def test_postgresql_sql(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = 'postgresql'
+        schema_editor.connection.ops.max_name_length.return_value = 63
+        schema_editor.quote_name = lambda name: '"{0}"'.format(name)
+        schema_editor.quote_value = lambda value: "'{0}'".format(value) if isinstance(value, str) else str(value)
+
+        install_sql = get_install_trigger_sql(
+            schema_editor, ActivatableModelWTriggers, 'is_active', BooleanActivationState())
+        self.assertEquals(len(install_sql), 3)
+        self.assertIn('RETURNS trigger', install_sql[0])
+        self.assertIn(
+            'INSERT INTO "activatable_model_triggers_triggeredactivationchange" ("model_table", "instance_id", '
+            '"is_active") VALUES (\'tests_activatablemodelwtriggers\', NEW."id", (NEW."is_active" = True))',
+            install_sql[0])
+        self.assertIn(
+            'WHEN ((OLD."is_active" = True) IS DISTINCT FROM (NEW."is_active" = True)) '
+            'EXECUTE PROCEDURE "tests_activatablemodelwtriggers_activation"()', install_sql[2])
+
+        self.assertEquals(get_uninstall_trigger_sql(schema_editor, ActivatableModelWTriggers)[-1], (
+            'DROP FUNCTION IF EXISTS "tests_activatablemodelwtriggers_activation"()'))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Runs the PostgreSQL triggers')
+    def test_postgresql_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tgname FROM pg_trigger '
+                "WHERE tgrelid = 'tests_activatablemodelwtriggers'::regclass AND NOT tgisinternal ORDER BY tgname")
+            self.assertEquals([row[0] for row in cursor.fetchall()], [
+                'tests_activatablemodelwtriggers_activation_insert',
+                'tests_activatablemodelwtriggers_activation_update',
+            ])
+
+        m = G(ActivatableModelWTriggers, is_active=True)
+        ActivatableModelWTriggers.objects.deactivate()
+        self.assertEquals(self.get_changes(), [(m.id, True), (m.id, False)])
+
+    def test_timestamp_and_enum_sql(self):
+        schema_editor = connection.schema_editor()
+        self.assertEquals(
+            TimestampActivationState().get_active_sql('NEW.deactivated_at', schema_editor.quote_value),
+            '(NEW.deactivated_at IS NULL)')
+        self.assertEquals(
+            EnumActivationState(active_value='on', inactive_value='off').get_active_sql(
+                'NEW.status', schema_editor.quote_value),
+            "(NEW.status = 'on')")
+
+    def test_operation(self):
+        operation = InstallActivationTriggers('ActivatableModelWTriggers')
+        self.assertEquals(operation.describe(), 'Install activation triggers on ActivatableModelWTriggers')
+        self.assertEquals(operation.migration_name_fragment, 'activation_triggers_activatablemodelwtriggers')
+        self.assertEquals(operation.deconstruct(), ('InstallActivationTriggers', [], {
+            'model_name': 'ActivatableModelWTriggers',
+            'field_name': 'is_active',
+            'activation_state': operation.activation_state,
+        }))
+
+
+class ConcurrencyStressTest(TransactionTestCase):
+    """
+    Runs overlapping activation operations from several threads and checks the emitted signals against the
+    final table state.
+    """
+    def create_models(self, num_models=10):
+        return [G(ActivatableModel, is_active=i % 2 == 0).id for i in range(num_models)]
+
+    def run_stale_deletes(self):
+        """
+        Runs two workers that both load the same active row before either of them deletes it.
+        """
+        barrier = threading.Barrier(2, timeout=5)
+
+        class StaleInstanceHarness(ActivationStressHarness):
+            def _load_instance(self, instance_id):
+                instance = super(StaleInstanceHarness, self)._load_instance(instance_id)
+                barrier.wait()
+                return instance
+
+        harness = StaleInstanceHarness(
+            ActivatableModel, [G(ActivatableModel, is_active=True).id], num_workers=2, num_operations=1, seed=1)
+        return harness.run(workloads=('delete',))
+
+    def test_stale_deletes_inconsistent(self):
+        # Both deletes compare against the loaded active state and signal the deactivation
+        result = self.run_stale_deletes()
+        self.assertEquals(result.errors, [])
+        self.assertEquals(len(result.changed_signals), 2)
+        self.assertEquals(result.inconsistent_ids, set(result.final_states))
+
+    @patch.object(ActivatableModel, 'CONDITIONAL_ACTIVATION_SAVE', True)
+    def test_stale_deletes_conditional_save(self):
+        result = self.run_stale_deletes()
+        self.assertEquals(result.errors, [])
+        self.assertEquals(len(result.changed_signals), 1)
+        self.assertEquals(result.inconsistent_ids, set())
+
+    @patch.object(ActivatableModel, 'CONDITIONAL_ACTIVATION_SAVE', True)
+    def test_conditional_save_and_delete(self):
+        harness = ActivationStressHarness(
+            ActivatableModel, self.create_models(), num_workers=4, num_operations=25, seed=1)
+        result = harness.run(workloads=('save', 'delete'))
+
+        self.assertEquals(result.errors, [])
+        self.assertEquals(result.num_operations, 100)
+        self.assertEquals(result.inconsistent_ids, set())
+
+    def test_bulk_and_chunked(self):
+        instance_ids = self.create_models()
+        harness = ActivationStressHarness(ActivatableModel, instance_ids, num_workers=4, num_operations=10, seed=1)
+        result = harness.run(workloads=('bulk', 'chunked'))
+
+        self.assertEquals(result.errors, [])
+        self.assertEquals(result.num_operations, 40)
+        self.assertGreater(result.throughput, 0)
+        self.assertGreaterEqual(result.lock_wait_seconds, 0)
+        self.assertEquals(set(result.final_states), set(instance_ids))
+        if connection.vendor == 'sqlite':
+            # SQLite serializes the transactions that write, so the ids fetched by each bulk update are not
+            # changed concurrently. Under READ COMMITTED on other databases, concurrent bulk updates of the same
+            # rows can signal the same change twice
+            self.assertEquals(result.inconsistent_ids, set())
+
+    def test_single_worker_all_workloads(self):
+        harness = ActivationStressHarness(
+            ActivatableModel, self.create_models(), num_workers=1, num_operations=40, seed=1)
+        result = harness.run()
+
+        self.assertEquals(result.num_retries, 0)
+        self.assertEquals(result.num_operations, 40)
+        self.assertEquals(result.inconsistent_ids, set())
+
+    def test_retries_lock_errors(self):
+        harness = ActivationStressHarness(
+            ActivatableModel, self.create_models(), num_workers=1, num_operations=2, max_retries=1, seed=1)
+        side_effect = [OperationalError, None, OperationalError, OperationalError]
+        with patch.object(harness, '_run_bulk', side_effect=side_effect):
+            result = harness.run(workloads=('bulk',))
+
+        self.assertEquals(result.num_operations, 1)
+        self.assertEquals(result.num_retries, 2)
+        self.assertEquals(len(result.errors), 1)
+
+    def test_rolled_back_signals_not_recorded(self):
+        class FailingHarness(ActivationStressHarness):
+            num_updates = 0
+
+            def _update(self, queryset, is_active):
+                super(FailingHarness, self)._update(queryset, is_active)
+                self.num_updates += 1
+                # Fail the second chunk of the first attempt after its signals were sent
+                if self.num_updates == 2:
+                    raise OperationalError('database is locked')
+
+        instance_ids = [G(ActivatableModel, is_active=True).id for i in range(4)]
+        harness = FailingHarness(ActivatableModel, instance_ids, num_workers=1, num_operations=1, chunk_size=1, seed=1)
+        result = harness.run(workloads=('chunked',))
+
+        self.assertEquals(result.num_retries, 1)
+        self.assertEquals(result.num_operations, 1)
+        self.assertEquals(result.errors, [])
+        self.assertEquals(len(result.changed_signals), 2)
+        self.assertEquals(result.inconsistent_ids, set())
+
+    def test_inconsistent_ids(self):
+        result = ActivationStressResult(
+            initial_states={1: True, 2: True, 3: False},
+            final_states={1: False, 2: False, 3: False},
+            changed_signals=[([1, 2], False), ([1], False), ([3], True)],
+            num_operations=3, duration=0, num_retries=0, lock_wait_seconds=0, errors=[])
+
+        # 1 was deactivated twice and 3 was activated without being deactivated again
+        self.assertEquals(result.inconsistent_ids, set([1, 3]))
+        self.assertEquals(result.throughput, 0)
+
+
+@patch.dict(activation_receivers, clear=True)
+class ActivationReceiverRegistryTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests receivers registered for a model and activation state.
+    """
+    def test_on_activated_on_deactivated(self):
+        activated_receiver = on_activated(ActivatableModel)(MagicMock())
+        deactivated_receiver = on_deactivated(ActivatableModel)(MagicMock())
+        other_model_receiver = on_activated(ActivatableModelWNonDefaultField)(MagicMock())
+
+        m = G(ActivatableModel, is_active=True)
+        activated_receiver.assert_called_once_with(sender=ActivatableModel, instance_ids=[m.id], is_active=True)
+        self.assertFalse(deactivated_receiver.called)
+
+        ActivatableModel.objects.deactivate()
+        deactivated_receiver.assert_called_once_with(sender=ActivatableModel, instance_ids=[m.id], is_active=False)
+        self.assertFalse(other_model_receiver.called)
+
+        # The signal is still sent to regular receivers
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+
+    def test_signals_sent_without_weakly_referenceable_sender(self):
+        # The activation signals do not cache receivers per sender, which would require senders that can be
+        # weakly referenced
+        for signal in (model_activations_changed, model_activations_updated):
+            for sender in (None, object()):
+                signal.send(sender=sender, instance_ids=[], is_active=True)
+
+    def test_not_called_without_changes(self):
+        G(ActivatableModel, is_active=True)
+        activated_receiver = on_activated(ActivatableModel)(MagicMock())
+
+        ActivatableModel.objects.activate()
+        self.assertFalse(activated_receiver.called)
+
+    def test_register_twice(self):
+        receiver = MagicMock()
+        register_activation_receiver(ActivatableModel, True, receiver)
+        register_activation_receiver(ActivatableModel, True, receiver)
+
+        G(ActivatableModel, is_active=True)
+        self.assertEquals(receiver.call_count, 1)
+
+    def test_unregister(self):
+        receiver = on_activated(ActivatableModel)(MagicMock())
+        unregister_activation_receiver(ActivatableModel, True, receiver)
+
+        G(ActivatableModel, is_active=True)
+        self.assertFalse(receiver.called)
+
+    def test_send_activations_changed(self):
+        receiver = on_deactivated(ActivatableModel)(MagicMock(return_value='response'))
+        responses = send_activations_changed(ActivatableModel, instance_ids=[1], is_active=False, change_sequence=5)
+
+        receiver.assert_called_once_with(
+            sender=ActivatableModel, instance_ids=[1], is_active=False, change_sequence=5)
+        self.assertIn((receiver, 'response'), responses)
+
+
+@patch.dict(activation_receivers, clear=True)
+class IndependentActivationReceiverTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests independent receivers that run in the receiver thread pool.
+    """
+    def test_chunk_size(self):
+        receiver = on_deactivated(ActivatableModel, independent=True, chunk_size=2)(MagicMock())
+
+        send_activations_changed(ActivatableModel, instance_ids=[1, 2, 3, 4, 5], is_active=False)
+        self.assertEquals(
+            sorted(call_args[1]['instance_ids'] for call_args in receiver.call_args_list), [[1, 2], [3, 4], [5]])
+
+    def test_async_receiver(self):
+        received = []
+
+        async def receiver(sender, instance_ids, is_active, **kwargs):
+            received.append(instance_ids)
+            return 'response'
+
+        on_activated(ActivatableModel, independent=True)(receiver)
+        on_deactivated(ActivatableModel)(receiver)
+
+        responses = send_activations_changed(ActivatableModel, instance_ids=[1], is_active=True)
+        send_activations_changed(ActivatableModel, instance_ids=[2], is_active=False)
+        self.assertEquals(received, [[1], [2]])
+        self.assertIn((receiver, 'response'), responses)
+
+    def test_errors_collected(self):
+        on_deactivated(ActivatableModel, independent=True)(MagicMock(side_effect=ValueError))
+        on_deactivated(ActivatableModel, independent=True, chunk_size=1)(MagicMock(side_effect=KeyError))
+        succeeding_receiver = on_deactivated(ActivatableModel, independent=True)(MagicMock())
+        dependent_receiver = on_deactivated(ActivatableModel)(MagicMock())
+
+        with self.assertRaises(ActivationReceiversError) as cm:
+            send_activations_changed(ActivatableModel, instance_ids=[1, 2], is_active=False)
+        self.assertEquals(
+            sorted(type(error).__name__ for error in cm.exception.errors), ['KeyError', 'KeyError', 'ValueError'])
+        self.assertTrue(succeeding_receiver.called)
+        self.assertTrue(dependent_receiver.called)
+
+    def test_errors_collected_when_receiver_raises(self):
+        on_deactivated(ActivatableModel, independent=True)(MagicMock(side_effect=KeyError))
+        on_deactivated(ActivatableModel)(MagicMock(side_effect=ValueError))
+
+        with self.assertRaises(ActivationReceiversError) as cm:
+            send_activations_changed(ActivatableModel, instance_ids=[1], is_active=False)
+        self.assertEquals([type(error).__name__ for error in cm.exception.errors], ['KeyError', 'ValueError'])
+
+    def test_fire_and_forget_after_commit(self):
+        called = threading.Event()
+        on_activated(ActivatableModel, independent=True, wait=False)(lambda **kwargs: called.set())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            G(ActivatableModel, is_active=True)
+        self.assertFalse(called.is_set())
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(called.wait(5))
+
+    @patch('activatable_model.signals.logger')
+    def test_fire_and_forget_error_logged(self, mock_logger):
+        logged = threading.Event()
+        mock_logger.error.side_effect = lambda *args, **kwargs: logged.set()
+        on_activated(ActivatableModel, independent=True, wait=False)(MagicMock(side_effect=ValueError))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_activations_changed(ActivatableModel, instance_ids=[1], is_active=True)
+        self.assertTrue(logged.wait(5))
+
+
+@patch.dict(activation_receivers, clear=True)
+class IndependentActivationReceiverThreadTest(TransactionTestCase):
+    """
+    Tests on which threads independent receivers run, which depends on the transaction of the sender.
+    """
+    def test_runs_on_pool_thread(self):
+        thread_ids = []
+        on_activated(ActivatableModel, independent=True)(
+            lambda instance_ids, **kwargs: thread_ids.append(threading.get_ident()))
+
+        G(ActivatableModel, is_active=True)
+        self.assertEquals(len(thread_ids), 1)
+        self.assertNotEquals(thread_ids[0], threading.get_ident())
+
+    def test_waits_when_receiver_raises(self):
+        finished = threading.Event()
+
+        def independent_receiver(**kwargs):
+            time.sleep(0.05)
+            finished.set()
+
+        on_deactivated(ActivatableModel, independent=True)(independent_receiver)
+        on_deactivated(ActivatableModel)(MagicMock(side_effect=ValueError))
+
+        with self.assertRaises(ValueError):
+            send_activations_changed(ActivatableModel, instance_ids=[1], is_active=False)
+        self.assertTrue(finished.is_set())
+
+    def test_nested_receivers_run_inline_on_pool_thread(self):
+        thread_ids = []
+
+        def outer_receiver(**kwargs):
+            thread_ids.append(threading.get_ident())
+            return send_activations_changed(ActivatableModelWNonDefaultField, instance_ids=[1, 2], is_active=True)
+
+        on_activated(ActivatableModel, independent=True)(outer_receiver)
+        inner_receiver = on_activated(ActivatableModelWNonDefaultField, independent=True, chunk_size=1)(
+            lambda **kwargs: thread_ids.append(threading.get_ident()))
+
+        # Waiting on the single pool thread from the pool thread would deadlock
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with patch('activatable_model.signals._receiver_executor', executor):
+                responses = send_activations_changed(ActivatableModel, instance_ids=[1], is_active=True)
+
+        self.assertEquals(len(thread_ids), 3)
+        self.assertEquals(len(set(thread_ids)), 1)
+        self.assertNotEquals(thread_ids[0], threading.get_ident())
+        # The responses of the signal receivers come first
+        self.assertEquals(responses[-1][0], outer_receiver)
+        self.assertEquals(responses[-1][1][-2:], [(inner_receiver, None), (inner_receiver, None)])
+
+    def test_inline_in_transaction(self):
+        thread_ids = []
+
+        def receiver(instance_ids, **kwargs):
+            thread_ids.append(threading.get_ident())
+            # A pool thread would wait on the lock of the transaction of the sender
+            Rel.objects.create(char_field='deactivated')
+
+        on_deactivated(ActivatableModel, independent=True)(receiver)
+        G(ActivatableModel, is_active=True)
+
+        with transaction.atomic():
+            ActivatableModel.objects.deactivate()
+            self.assertEquals(thread_ids, [threading.get_ident()])
+        self.assertTrue(Rel.objects.filter(char_field='deactivated').exists())
+
+    def test_inline_in_transaction_on_other_database(self):
+        thread_ids = []
+        on_activated(ActivatableModel, independent=True)(
+            lambda instance_ids, **kwargs: thread_ids.append(threading.get_ident()))
+
+        # The rows may have been updated on a database other than the one the sender is routed to
+        with patch('activatable_model.signals.connections') as mock_connections:
+            mock_connections.all.return_value = [MagicMock(in_atomic_block=False), MagicMock(in_atomic_block=True)]
+            send_activations_changed(ActivatableModel, instance_ids=[1], is_active=True)
+        self.assertEquals(thread_ids, [threading.get_ident()])
+
+
+@patch.dict(activation_receivers, clear=True)
+@patch.dict(inherited_activation_receivers, clear=True)
+class InheritedActivationTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests models that inherit their activation from a parent.
+    """
+    def setUp(self):
+        super(InheritedActivationTest, self).setUp()
+        self.active_parent = G(ActivatableModel, is_active=True)
+        self.inactive_parent = G(ActivatableModel, is_active=False)
+        self.active_child = G(ActivatableModelWParent, parent=self.active_parent, is_active=True)
+        self.inactive_child = G(ActivatableModelWParent, parent=self.active_parent, is_active=False)
+        self.child_w_inactive_parent = G(ActivatableModelWParent, parent=self.inactive_parent, is_active=True)
+        self.child_wo_parent = G(ActivatableModelWParent, parent=None, is_active=True)
+        self.grandchild = G(ActivatableModelWGrandparent, parent=self.active_child, is_active=True)
+        self.grandchild_w_inactive_grandparent = G(
+            ActivatableModelWGrandparent, parent=self.child_w_inactive_parent, is_active=True)
+
+    def test_effectively_active(self):
+        self.assertEquals(
+            set(ActivatableModelWParent.objects.effectively_active()), {self.active_child, self.child_wo_parent})
+        self.assertEquals(list(ActivatableModelWGrandparent.objects.effectively_active()), [self.grandchild])
+        self.assertEquals(list(ActivatableModel.objects.effectively_active()), [self.active_parent])
+
+    def test_effectively_inactive(self):
+        self.assertEquals(
+            set(ActivatableModelWParent.objects.effectively_inactive()),
+            {self.inactive_child, self.child_w_inactive_parent})
+        self.assertEquals(
+            list(ActivatableModelWGrandparent.objects.effectively_inactive()),
+            [self.grandchild_w_inactive_grandparent])
+        self.assertEquals(list(ActivatableModel.objects.effectively_inactive()), [self.inactive_parent])
+
+    def test_deactivate_parent(self):
+        # The children are not updated. The fourth query records the change in the change feed
+        with self.assertNumQueries(4):
+            ActivatableModel.objects.filter(id=self.active_parent.id).deactivate()
+
+        self.assertFalse(ActivatableModelWParent.objects.effectively_active().filter(
+            id=self.active_child.id).exists())
+        self.assertFalse(ActivatableModelWGrandparent.objects.effectively_active().exists())
+        # The children keep their own activation state
+        self.assertTrue(ActivatableModelWParent.objects.get(id=self.active_child.id).is_active)
+
+    def test_is_effectively_active(self):
+        self.assertTrue(self.grandchild.is_effectively_active)
+        self.assertFalse(self.grandchild_w_inactive_grandparent.is_effectively_active)
+        self.assertFalse(self.inactive_child.is_effectively_active)
+        self.assertTrue(self.child_wo_parent.is_effectively_active)
+
+    def test_inherited_receiver(self):
+        receiver = on_deactivated(ActivatableModelWParent, inherited=True)(MagicMock())
+
+        ActivatableModel.objects.filter(id=self.active_parent.id).deactivate()
+        receiver.assert_called_once_with(
+            sender=ActivatableModelWParent, instance_ids=[self.active_child.id], is_active=False,
+            inherited_from=ActivatableModel)
+
+        # The receiver is still called for changes of the model itself
+        self.child_wo_parent.delete()
+        receiver.assert_called_with(
+            sender=ActivatableModelWParent, instance_ids=[self.child_wo_parent.id], is_active=False)
+
+    def test_inherited_receiver_not_inherited(self):
+        receiver = on_deactivated(ActivatableModelWParent)(MagicMock())
+
+        ActivatableModel.objects.filter(id=self.active_parent.id).deactivate()
+        self.assertFalse(receiver.called)
+
+    def test_inherited_receiver_of_grandchildren(self):
+        receiver = on_activated(ActivatableModelWGrandparent, inherited=True)(MagicMock())
+
+        # The grandchildren of an inactive grandparent do not become effectively active
+        ActivatableModelWParent.objects.filter(id=self.child_w_inactive_parent.id).update(is_active=False)
+        ActivatableModelWParent.objects.filter(id=self.child_w_inactive_parent.id).activate()
+        self.assertFalse(receiver.called)
+
+        ActivatableModel.objects.filter(id=self.inactive_parent.id).activate()
+        receiver.assert_called_once_with(
+            sender=ActivatableModelWGrandparent, instance_ids=[self.grandchild_w_inactive_grandparent.id],
+            is_active=True, inherited_from=ActivatableModelWParent)
+
+    def test_unregister_inherited_receiver(self):
+        receiver = on_deactivated(ActivatableModelWParent, inherited=True)(MagicMock())
+        unregister_activation_receiver(ActivatableModelWParent, False, receiver)
+
+        ActivatableModel.objects.filter(id=self.active_parent.id).deactivate()
+        self.assertFalse(receiver.called)
+
+
+@patch.object(ActivatableModelAdmin, 'message_user')
+class ActivatableModelAdminTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests the admin actions, deletion and list filter of activatable models.
+    """
+    def setUp(self):
+        super(ActivatableModelAdminTest, self).setUp()
+        self.model_admin = ActivatableModelAdmin(ActivatableModel, AdminSite())
+        self.request = RequestFactory().get('/')
+        self.request.user = G(User, is_superuser=True, is_active=True)
+
+    def test_actions(self, mock_message_user):
+        actions = self.model_admin.get_actions(self.request)
+        self.assertIn('activate_selected', actions)
+        self.assertIn('deactivate_selected', actions)
+        self.assertNotIn('delete_selected', actions)
+
+    def test_deactivate_selected_in_chunks(self, mock_message_user):
+        models = [G(ActivatableModel, is_active=True) for i in range(4)] + [G(ActivatableModel, is_active=False)]
+        other_model = G(ActivatableModel, is_active=True)
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        self.model_admin.activation_chunk_size = 2
+        queryset = ActivatableModel.objects.filter(id__in=[m.id for m in models])
+        self.model_admin.deactivate_selected(self.request, queryset)
+
+        self.assertFalse(ActivatableModel.objects.filter(id__in=[m.id for m in models], is_active=True).exists())
+        self.assertTrue(ActivatableModel.objects.get(id=other_model.id).is_active)
+        self.assertEquals(
+            [call_args[1]['instance_ids'] for call_args in self.mock_model_activations_changed_handler.call_args_list],
+            [[models[0].id, models[1].id], [models[2].id, models[3].id], []])
+        mock_message_user.assert_called_once_with(self.request, 'Deactivated 4 activatable models.')
+
+    def test_activate_selected(self, mock_message_user):
+        m = G(ActivatableModel, is_active=False)
+        self.model_admin.activate_selected(self.request, ActivatableModel.objects.all())
+
+        self.assertTrue(ActivatableModel.objects.get(id=m.id).is_active)
+        mock_message_user.assert_called_once_with(self.request, 'Activated 1 activatable models.')
+
+    def test_deactivate_selected_database(self, mock_message_user):
+        m = G(ActivatableModel, is_active=True)
+
+        # The router would send the updates to a database that does not exist
+        with override_settings(DATABASE_ROUTERS=[OtherDatabaseRouter()]):
+            self.model_admin.deactivate_selected(self.request, ActivatableModel.objects.using('default'))
+
+        self.assertFalse(ActivatableModel.objects.get(id=m.id).is_active)
+        mock_message_user.assert_called_once_with(self.request, 'Deactivated 1 activatable models.')
+
+    def test_get_deleted_objects(self, mock_message_user):
+        m = G(ActivatableModel, is_active=True)
+        G(ActivatableModelWParent, parent=m)
+
+        with self.assertNumQueries(0):
+            deleted_objects, model_count, perms_needed, protected = self.model_admin.get_deleted_objects(
+                [m], self.request)
+        self.assertEquals(deleted_objects, [str(m)])
+        self.assertEquals(model_count, {'activatable models': 1})
+        self.assertEquals(perms_needed, set())
+        self.assertEquals(protected, [])
+
+    def test_list_filter(self, mock_message_user):
+        active_model = G(ActivatableModel, is_active=True)
+        G(ActivatableModel, is_active=True)
+        inactive_model = G(ActivatableModel, is_active=False)
+        self.assertEquals(self.model_admin.get_list_filter(self.request), (ActivationStateListFilter,))
+
+        with self.assertNumQueries(1):
+            list_filter = ActivationStateListFilter(
+                self.request, {'is_active': '0'}, ActivatableModel, self.model_admin)
+        self.assertEquals(list(list_filter.lookup_choices), [('1', 'Active (2)'), ('0', 'Inactive (1)')])
+        self.assertEquals(list(list_filter.queryset(self.request, ActivatableModel.objects.all())), [inactive_model])
+
+        list_filter = ActivationStateListFilter(self.request, {'is_active': '1'}, ActivatableModel, self.model_admin)
+        self.assertIn(active_model, list_filter.queryset(self.request, ActivatableModel.objects.all()))
+
+    def test_list_filter_non_default_field(self, mock_message_user):
+        m = G(ActivatableModelWNonDefaultField, active=True)
+        model_admin = ActivatableModelAdmin(ActivatableModelWNonDefaultField, AdminSite())
+
+        list_filter = ActivationStateListFilter(
+            self.request, {'is_active': '1'}, ActivatableModelWNonDefaultField, model_admin)
+        self.assertEquals(list(list_filter.lookup_choices), [('1', 'Active (1)'), ('0', 'Inactive (0)')])
+        self.assertEquals(
+            list(list_filter.queryset(self.request, ActivatableModelWNonDefaultField.objects.all())), [m])
+
+
+class PartitionTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests models that are partitioned by activation, using the mirrored tables on SQLite.
+    """
+    def get_partition_ids(self):
+        ids = []
+        with connection.cursor() as cursor:
+            for table in ('tests_activatablemodelwpartitions_active', 'tests_activatablemodelwpartitions_inactive'):
+                cursor.execute('SELECT id FROM {0} ORDER BY id'.format(connection.ops.quote_name(table)))
+                ids.append([row[0] for row in cursor.fetchall()])
+        return ids
+
+    def test_create_and_save(self):
+        m1 = G(ActivatableModelWPartitions, is_active=True)
+        m2 = G(ActivatableModelWPartitions, is_active=False)
+        self.assertEquals(self.get_partition_ids(), [[m1.id], [m2.id]])
+
+        m1.is_active = False
+        m1.save()
+        self.assertEquals(self.get_partition_ids(), [[], [m1.id, m2.id]])
+
+    def test_activate_deactivate(self):
+        m1 = G(ActivatableModelWPartitions, is_active=True)
+        m2 = G(ActivatableModelWPartitions, is_active=False)
+
+        ActivatableModelWPartitions.objects.activate()
+        self.assertEquals(self.get_partition_ids(), [[m1.id, m2.id], []])
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['instance_ids'], [m2.id])
+
+        ActivatableModelWPartitions.objects.filter(id=m1.id).deactivate()
+        self.assertEquals(self.get_partition_ids(), [[m2.id], [m1.id]])
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['instance_ids'], [m1.id])
+
+    def test_set_active(self):
+        m1 = G(ActivatableModelWPartitions, is_active=True)
+        m2 = G(ActivatableModelWPartitions, is_active=False)
+
+        ActivatableModelWPartitions.objects.set_active([m2.id])
+        self.assertEquals(self.get_partition_ids(), [[m2.id], [m1.id]])
+
+    def test_force_delete(self):
+        m = G(ActivatableModelWPartitions, is_active=True)
+        m.delete(force=True)
+        self.assertEquals(self.get_partition_ids(), [[], []])
+
+    def test_unpartition_and_partition(self):
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for sql in get_unpartition_sql(schema_editor, ActivatableModelWPartitions):
+                cursor.execute(sql)
+            m1 = G(ActivatableModelWPartitions, is_active=True)
+            m2 = G(ActivatableModelWPartitions, is_active=False)
+
+            # Existing rows are copied into the partitions
+            for sql in get_partition_sql(
+                schema_editor, ActivatableModelWPartitions, 'is_active', BooleanActivationState()
+            ):
+                cursor.execute(sql)
+            self.assertEquals(self.get_partition_ids(), [[m1.id], [m2.id]])
+
+    def test_retry_row_movement(self):
+        m = G(ActivatableModelWPartitions, is_active=True)
+        update = ManagerUtilsQuerySet.update
+        errors = [OperationalError('tuple to be updated was already moved to another partition')]
+
+        def update_after_concurrent_move(queryset, **kwargs):
+            if errors:
+                raise errors.pop()
+            return update(queryset, **kwargs)
+
+        with patch.object(
+            ManagerUtilsQuerySet, 'update', autospec=True, side_effect=update_after_concurrent_move
+        ) as mock_update:
+            ActivatableModelWPartitions.objects.deactivate()
+
+        self.assertEquals(mock_update.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['instance_ids'], [m.id])
+        self.assertEquals(self.get_partition_ids(), [[], [m.id]])
+
+    def test_retry_row_movement_other_error(self):
+        G(ActivatableModelWPartitions, is_active=True)
+        with patch.object(ManagerUtilsQuerySet, 'update', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                ActivatableModelWPartitions.objects.deactivate()
+
+    def test_retry_row_movement_exhausted(self):
+        G(ActivatableModelWPartitions, is_active=True)
+        with patch.object(ManagerUtilsQuerySet, 'update', side_effect=OperationalError(
+            'tuple to be locked was already moved to another partition due to concurrent update'
+        )) as mock_update:
+            with self.assertRaises(OperationalError):
+                ActivatableModelWPartitions.objects.set_active([])
+        self.assertEquals(mock_update.call_count, 4)
+
+    def test_postgresql_sql(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = 'postgresql'
+        schema_editor.connection.ops.max_name_length.return_value = 63
+        schema_editor.quote_name = lambda name: '"{0}"'.format(name)
+        schema_editor.quote_value = lambda value: "'{0}'".format(value) if isinstance(value, str) else str(value)
+        schema_editor._model_indexes_sql.return_value = ['CREATE INDEX "char_field_idx"']
+
+        partition_sql = get_partition_sql(
+            schema_editor, ActivatableModelWPartitions, 'is_active', BooleanActivationState())
+        self.assertEquals(partition_sql[:4], [
+            'ALTER TABLE "tests_activatablemodelwpartitions" RENAME TO '
+            '"tests_activatablemodelwpartitions_unpartitioned"',
+            (
+                'CREATE TABLE "tests_activatablemodelwpartitions" '
+                '(LIKE "tests_activatablemodelwpartitions_unpartitioned" '
+                'INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+                'PARTITION BY LIST ("is_active")'
+            ),
+            'CREATE TABLE "tests_activatablemodelwpartitions_active" PARTITION OF '
+            '"tests_activatablemodelwpartitions" FOR VALUES IN (True)',
+            'CREATE TABLE "tests_activatablemodelwpartitions_inactive" PARTITION OF '
+            '"tests_activatablemodelwpartitions" DEFAULT',
+        ])
+        self.assertIn(
+            'ALTER TABLE "tests_activatablemodelwpartitions" ADD PRIMARY KEY ("id", "is_active")', partition_sql)
+        self.assertEquals(partition_sql[-1], 'CREATE INDEX "char_field_idx"')
+
+        unpartition_sql = get_unpartition_sql(schema_editor, ActivatableModelWPartitions)
+        self.assertIn('ALTER TABLE "tests_activatablemodelwpartitions" ADD PRIMARY KEY ("id")', unpartition_sql)
+        self.assertIn('DROP TABLE "tests_activatablemodelwpartitions_partitioned"', unpartition_sql)
+
+        # Active rows of timestamp states are NULL, which the primary key cannot contain
+        with self.assertRaises(NotSupportedError):
+            get_partition_sql(
+                schema_editor, ActivatableModelWTimestamp, 'deactivated_at', TimestampActivationState())
+        self.assertIn("FOR VALUES IN ('on')", get_partition_sql(
+            schema_editor, ActivatableModelWPartitions, 'char_field', EnumActivationState('on', 'off'))[2])
+
+    def test_migrated_partitions(self):
+        m = G(ActivatableModelWMigratedPartitions, is_active=True)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM tests_activatablemodelwmigratedpartitions_active')
+            self.assertEquals(cursor.fetchall(), [(m.id,)])
+
+    def test_postgresql_deferred_sql(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = 'postgresql'
+        schema_editor.connection.alias = 'default'
+        schema_editor.connection.ops.max_name_length.return_value = 63
+        schema_editor.quote_name = lambda name: '"{0}"'.format(name)
+        schema_editor.quote_value = str
+        schema_editor._model_indexes_sql.return_value = []
+        index_sql = Statement(
+            'CREATE INDEX %(name)s ON %(table)s', name='char_field_idx',
+            table=Table('tests_activatablemodelwpartitions', schema_editor.quote_name))
+        other_index_sql = Statement(
+            'CREATE INDEX %(name)s ON %(table)s', name='char_field_idx',
+            table=Table('tests_activatablemodel', schema_editor.quote_name))
+        schema_editor.deferred_sql = [index_sql, other_index_sql]
+        to_state = MagicMock()
+        to_state.apps.get_model.return_value = ActivatableModelWPartitions
+
+        # Indexes deferred by a CreateModel of the same migration are created by the operation instead
+        PartitionByActivation('ActivatableModelWPartitions').database_forwards('tests', schema_editor, None, to_state)
+        self.assertEquals(schema_editor.deferred_sql, [other_index_sql])
+        self.assertTrue(schema_editor.execute.called)
+
+    def test_unsupported_vendor(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = 'oracle'
+        schema_editor.connection.ops.max_name_length.return_value = 30
+        with self.assertRaises(NotSupportedError):
+            get_partition_sql(schema_editor, ActivatableModelWPartitions, 'is_active', BooleanActivationState())
+        with self.assertRaises(NotSupportedError):
+            get_unpartition_sql(schema_editor, ActivatableModelWPartitions)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning requires PostgreSQL')
+class PostgresqlPartitionTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests models that are partitioned by activation on PostgreSQL.
+    """
+    def get_partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id, tableoid::regclass::text FROM tests_activatablemodelwpartitions')
+            return dict(cursor.fetchall())
+
+    def test_partitioned_table(self):
+        # The first model is partitioned in the migration that creates it, the second one in a later migration
+        for table in ('tests_activatablemodelwpartitions', 'tests_activatablemodelwmigratedpartitions'):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT partrelid::regclass::text FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+                    [table])
+                self.assertEquals(cursor.fetchall(), [(table,)])
+
+                # The index of char_field and its pattern index are created once
+                cursor.execute(
+                    "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef LIKE '%%char_field%%'",
+                    [table])
+                self.assertEquals(len(cursor.fetchall()), 2)
+
+    def test_create_and_save(self):
+        m1 = G(ActivatableModelWPartitions, is_active=True)
+        m2 = G(ActivatableModelWPartitions, is_active=False)
+        self.assertEquals(self.get_partitions(), {
+            m1.id: 'tests_activatablemodelwpartitions_active',
+            m2.id: 'tests_activatablemodelwpartitions_inactive',
+        })
+
+        m1.is_active = False
+        m1.save()
+        self.assertEquals(self.get_partitions()[m1.id], 'tests_activatablemodelwpartitions_inactive')
+
+    def test_activate_deactivate(self):
+        m1 = G(ActivatableModelWPartitions, is_active=True)
+        m2 = G(ActivatableModelWPartitions, is_active=False)
+
+        ActivatableModelWPartitions.objects.activate()
+        self.assertEquals(set(self.get_partitions().values()), {'tests_activatablemodelwpartitions_active'})
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['instance_ids'], [m2.id])
+
+        ActivatableModelWPartitions.objects.filter(id=m1.id).deactivate()
+        self.assertEquals(self.get_partitions(), {
+            m1.id: 'tests_activatablemodelwpartitions_inactive',
+            m2.id: 'tests_activatablemodelwpartitions_active',
+        })
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['instance_ids'], [m1.id])
+        self.assertEquals(list(ActivatableModelWPartitions.objects.active()), [m2])
+
+    def test_deconstruct(self):
+        operation = PartitionByActivation('ActivatableModelWPartitions')
+        self.assertEquals(operation.deconstruct()[0], 'PartitionByActivation')
+        self.assertEquals(operation.describe(), 'Partition ActivatableModelWPartitions by activation')
+        self.assertEquals(
+            operation.migration_name_fragment, 'partition_activatablemodelwpartitions_by_activation')
+
+
 class SaveTest(BaseMockActivationsSignalHanderTest):
     """
     Tests the custom save function in the BaseActivatableModel.
@@ -276,6 +1741,76 @@ class SaveTest(BaseMockActivationsSignalHanderTest):
         self.assertEquals(updated_call_args[1]['sender'], ActivatableModelWNonDefaultField)
 
 
+@patch.object(ActivatableModel, 'CONDITIONAL_ACTIVATION_SAVE', True)
+class ConditionalSaveTest(BaseMockActivationsSignalHanderTest):
+    """
+    Tests saving the activatable field with a conditional update.
+    """
+    def test_create(self):
+        m = G(ActivatableModel, is_active=False)
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m.id], is_active=False)
+
+    def test_save_changed(self):
+        m = G(ActivatableModel, is_active=False)
+        m.is_active = True
+        m.char_field = 'hi'
+        m.save()
+
+        m = ActivatableModel.objects.get(id=m.id)
+        self.assertTrue(m.is_active)
+        self.assertEquals(m.char_field, 'hi')
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['is_active'], True)
+        self.assertEquals(self.mock_model_activations_updated_handler.call_count, 2)
+
+    def test_concurrent_saves_signal_once(self):
+        m = G(ActivatableModel, is_active=True)
+        m1 = ActivatableModel.objects.get(id=m.id)
+        m2 = ActivatableModel.objects.get(id=m.id)
+
+        m1.is_active = False
+        m1.save()
+        m2.is_active = False
+        m2.save()
+
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_updated_handler.call_count, 3)
+
+    def test_concurrent_deletes_signal_once(self):
+        m = G(ActivatableModel, is_active=True)
+        m1 = ActivatableModel.objects.get(id=m.id)
+        m2 = ActivatableModel.objects.get(id=m.id)
+
+        m1.delete()
+        m2.delete()
+
+        self.assertFalse(ActivatableModel.objects.get(id=m.id).is_active)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 2)
+        self.assertEquals(self.mock_model_activations_changed_handler.call_args[1]['is_active'], False)
+
+    def test_stale_in_memory_state(self):
+        m = G(ActivatableModel, is_active=False)
+        ActivatableModel.objects.filter(id=m.id).update(is_active=True)
+        self.mock_model_activations_changed_handler.reset_mock()
+
+        # The in memory value is still inactive, but the row is active, so this is a change
+        m.delete()
+        self.mock_model_activations_changed_handler.assert_called_once_with(
+            sender=ActivatableModel, signal=model_activations_changed, instance_ids=[m.id], is_active=False)
+
+    def test_save_update_fields_without_activatable_field(self):
+        m = G(ActivatableModel, is_active=False)
+        m.is_active = True
+        m.char_field = 'hi'
+        m.save(update_fields=['char_field'])
+
+        m = ActivatableModel.objects.get(id=m.id)
+        self.assertFalse(m.is_active)
+        self.assertEquals(m.char_field, 'hi')
+        self.assertEquals(self.mock_model_activations_changed_handler.call_count, 1)
+
+
 class SingleDeleteTest(BaseMockActivationsSignalHanderTest):
     """
     Tests calling delete on a single model that inherits BaseActivatableModel.
@@ -314,7 +1849,14 @@ class ValidateDbTest(TestCase):
                     ActivatableModel,
                     ActivatableModelWRel,
                     ActivatableModelWRelAndCascade,
-                    ActivatableModelWNonDefaultField
+                    ActivatableModelWNonDefaultField,
+                    ActivatableModelWTimestamp,
+                    ActivatableModelWStatus,
+                    ActivatableModelWTriggers,
+                    ActivatableModelWParent,
+                    ActivatableModelWGrandparent,
+                    ActivatableModelWPartitions,
+                    ActivatableModelWMigratedPartitions,
                 ]
             ),
             set(activatable_models)
@@ -363,6 +1905,134 @@ class ValidateDbTest(TestCase):
         with self.assertRaises(ValidationError):
             validate_activatable_models()
 
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_timestamp_activatable_field_is_not_nullable(self, mock_get_activatable_models):
+        """
+        A timestamp activation state needs a nullable DateTimeField.
+        """
+        class NonNullTimestampModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            ACTIVATABLE_FIELD_NAME = 'deactivated_at'
+            ACTIVATION_STATE = TimestampActivationState()
+            deactivated_at = models.DateTimeField()
+
+        mock_get_activatable_models.return_value = [NonNullTimestampModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_enum_activatable_field_is_boolean(self, mock_get_activatable_models):
+        """
+        An enum activation state cannot be stored in a BooleanField.
+        """
+        class BooleanEnumModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            ACTIVATION_STATE = EnumActivationState(active_value=1, inactive_value=2)
+            is_active = models.BooleanField(default=False)
+
+        mock_get_activatable_models.return_value = [BooleanEnumModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_activation_parent_not_activatable(self, mock_get_activatable_models):
+        """
+        Activation can only be inherited from another activatable model.
+        """
+        class NonActivatableParentModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            ACTIVATION_PARENT_FIELD = 'rel'
+            is_active = models.BooleanField(default=False)
+            rel = models.ForeignKey(Rel, on_delete=models.PROTECT)
+
+        mock_get_activatable_models.return_value = [NonActivatableParentModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_activation_parent_not_defined(self, mock_get_activatable_models):
+        mock_get_activatable_models.return_value = [ActivatableModelWParent, ActivatableModel]
+        with patch.object(ActivatableModelWParent, 'ACTIVATION_PARENT_FIELD', 'is_active'):
+            with self.assertRaises(ValidationError):
+                validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_partitioned_unique_field(self, mock_get_activatable_models):
+        """
+        Unique constraints of partitioned tables must include the activatable field.
+        """
+        class UniqueFieldModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            PARTITION_BY_ACTIVATION = True
+            is_active = models.BooleanField(default=False)
+            email = models.CharField(max_length=64, unique=True)
+
+        mock_get_activatable_models.return_value = [UniqueFieldModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_partitioned_nullable_field(self, mock_get_activatable_models):
+        """
+        The activatable field becomes part of the primary key of partitioned tables and cannot be NULL.
+        """
+        mock_get_activatable_models.return_value = [ActivatableModelWTimestamp]
+        with patch.object(ActivatableModelWTimestamp, 'PARTITION_BY_ACTIVATION', True):
+            with self.assertRaises(ValidationError):
+                validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_partitioned_reverse_foreign_key(self, mock_get_activatable_models):
+        """
+        Foreign keys to partitioned tables would have to reference the activatable field.
+        """
+        mock_get_activatable_models.return_value = [ActivatableModel, ActivatableModelWPartitions]
+        validate_activatable_models()
+
+        # ActivatableModelWParent has a foreign key to ActivatableModel
+        with patch.object(ActivatableModel, 'PARTITION_BY_ACTIVATION', True):
+            with self.assertRaises(ValidationError):
+                validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_partitioned_many_to_many_field(self, mock_get_activatable_models):
+        class ManyToManyModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            PARTITION_BY_ACTIVATION = True
+            is_active = models.BooleanField(default=False)
+            rels = models.ManyToManyField(Rel)
+
+        mock_get_activatable_models.return_value = [ManyToManyModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
+    @patch('activatable_model.validation.get_activatable_models')
+    def test_trigger_tracked_non_integer_pk(self, mock_get_activatable_models):
+        """
+        Activation triggers can only record integer primary keys.
+        """
+        class CharPkModel(BaseActivatableModel):
+            class Meta:
+                abstract = True
+
+            TRACK_ACTIVATIONS_WITH_TRIGGERS = True
+            id = models.CharField(max_length=64, primary_key=True)
+            is_active = models.BooleanField(default=False)
+
+        mock_get_activatable_models.return_value = [CharPkModel]
+        with self.assertRaises(ValidationError):
+            validate_activatable_models()
+
     @patch('activatable_model.validation.get_activatable_models')
     def test_foreign_key_is_null(self, mock_get_activatable_models):
         """
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class TriggersConfig(AppConfig):
+    name = 'activatable_model.triggers'
+    label = 'activatable_model_triggers'
+    verbose_name = 'Django Activatable Model Triggers'
@@ -0,0 +1,41 @@
+from itertools import groupby
+
+from django.db import transaction
+
+from activatable_model.signals import send_activations_changed
+from activatable_model.triggers.models import TriggeredActivationChange
+from activatable_model.validation import get_activatable_models
+
+
+def drain_activation_changes(batch_size=1000, max_batches=None):
+    """
+    Reads the changes appended by activation triggers in batches and sends model_activations_changed for each
+    run of changes with the same model and activation state, in the order the changes were made. Each batch
+    is deleted in the same transaction that its signals are sent in, so a failing receiver leaves the batch
+    to be drained again. Returns the number of drained changes.
+    """
+    models_by_table = {model._meta.db_table: model for model in get_activatable_models()}
+    num_drained = 0
+    num_batches = 0
+    while max_batches is None or num_batches < max_batches:
+        with transaction.atomic():
+            changes = list(
+                TriggeredActivationChange.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not changes:
+                break
+
+            for (model_table, is_active), table_changes in groupby(
+                changes, key=lambda change: (change.model_table, change.is_active)
+            ):
+                model = models_by_table.get(model_table)
+                instance_ids = [change.instance_id for change in table_changes]
+                if model is not None:
+                    send_activations_changed(model, instance_ids=instance_ids, is_active=is_active)
+
+            TriggeredActivationChange.objects.filter(id__in=[change.id for change in changes]).delete()
+
+        num_drained += len(changes)
+        num_batches += 1
+
+    return num_drained
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from activatable_model.triggers.drain import drain_activation_changes
+
+
+class Command(BaseCommand):
+    help = 'Sends model_activations_changed for the activation changes recorded by database triggers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help='The number of changes drained per transaction')
+        parser.add_argument(
+            '--max-batches', type=int, default=None, help='The maximum number of batches to drain')
+
+    def handle(self, *args, **options):
+        num_drained = drain_activation_changes(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write('Drained {0} activation changes'.format(num_drained))
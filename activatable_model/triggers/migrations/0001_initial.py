@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TriggeredActivationChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model_table', models.CharField(max_length=255)),
+                ('instance_id', models.BigIntegerField()),
+                ('is_active', models.BooleanField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class TriggeredActivationChange(models.Model):
+    """
+    A row appended by a database trigger when the activation state of a row of a trigger tracked model
+    changes. Rows are deleted once they are drained.
+    """
+    id = models.BigAutoField(primary_key=True)
+    model_table = models.CharField(max_length=255)
+    instance_id = models.BigIntegerField()
+    is_active = models.BooleanField()
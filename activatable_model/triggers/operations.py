@@ -0,0 +1,138 @@
+from django.db import NotSupportedError
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+
+from activatable_model.states import BooleanActivationState
+from activatable_model.triggers.models import TriggeredActivationChange
+
+
+class InstallActivationTriggers(Operation):
+    """
+    Installs row triggers on the table of an activatable model that append a TriggeredActivationChange for
+    every inserted row and every row whose activation state changes, including changes made with raw SQL.
+    Supports SQLite and PostgreSQL. The migration must depend on the initial migration of
+    activatable_model.triggers.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name='is_active', activation_state=None):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.activation_state = activation_state or BooleanActivationState()
+
+    def deconstruct(self):
+        kwargs = {
+            'model_name': self.model_name,
+            'field_name': self.field_name,
+            'activation_state': self.activation_state,
+        }
+        return (self.__class__.__name__, [], kwargs)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql in get_install_trigger_sql(schema_editor, model, self.field_name, self.activation_state):
+                schema_editor.execute(sql, params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for sql in get_uninstall_trigger_sql(schema_editor, model):
+                schema_editor.execute(sql, params=None)
+
+    def describe(self):
+        return 'Install activation triggers on {0}'.format(self.model_name)
+
+    @property
+    def migration_name_fragment(self):
+        return 'activation_triggers_{0}'.format(self.model_name.lower())
+
+
+def get_trigger_name(schema_editor, model):
+    """
+    Returns the name of the trigger function, leaving room for the _insert and _update trigger suffixes.
+    """
+    max_name_length = schema_editor.connection.ops.max_name_length()
+    return truncate_name(
+        '{0}_activation'.format(model._meta.db_table), max_name_length - len('_insert') if max_name_length else None)
+
+
+def get_install_trigger_sql(schema_editor, model, field_name, activation_state):
+    """
+    Returns the SQL statements that install the activation triggers of the model.
+    """
+    qn = schema_editor.quote_name
+    table = model._meta.db_table
+    trigger_name = get_trigger_name(schema_editor, model)
+    column = model._meta.get_field(field_name).column
+    new_active_sql = activation_state.get_active_sql('NEW.{0}'.format(qn(column)), schema_editor.quote_value)
+    old_active_sql = activation_state.get_active_sql('OLD.{0}'.format(qn(column)), schema_editor.quote_value)
+    insert_change_sql = (
+        'INSERT INTO {changes_table} ({model_table}, {instance_id}, {is_active}) '
+        'VALUES ({table}, NEW.{pk}, {new_active})'
+    ).format(
+        changes_table=qn(TriggeredActivationChange._meta.db_table),
+        model_table=qn('model_table'),
+        instance_id=qn('instance_id'),
+        is_active=qn('is_active'),
+        table=schema_editor.quote_value(table),
+        pk=qn(model._meta.pk.column),
+        new_active=new_active_sql,
+    )
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        return [
+            'CREATE TRIGGER {trigger} AFTER INSERT ON {table} FOR EACH ROW BEGIN {insert_change}; END'.format(
+                trigger=qn(trigger_name + '_insert'), table=qn(table), insert_change=insert_change_sql),
+            (
+                'CREATE TRIGGER {trigger} AFTER UPDATE OF {column} ON {table} FOR EACH ROW '
+                'WHEN {old_active} IS NOT {new_active} BEGIN {insert_change}; END'
+            ).format(
+                trigger=qn(trigger_name + '_update'), column=qn(column), table=qn(table),
+                old_active=old_active_sql, new_active=new_active_sql, insert_change=insert_change_sql),
+        ]
+    elif vendor == 'postgresql':
+        return [
+            (
+                'CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$ '
+                'BEGIN {insert_change}; RETURN NULL; END; $$ LANGUAGE plpgsql'
+            ).format(function=qn(trigger_name), insert_change=insert_change_sql),
+            'CREATE TRIGGER {trigger} AFTER INSERT ON {table} FOR EACH ROW EXECUTE PROCEDURE {function}()'.format(
+                trigger=qn(trigger_name + '_insert'), table=qn(table), function=qn(trigger_name)),
+            (
+                'CREATE TRIGGER {trigger} AFTER UPDATE OF {column} ON {table} FOR EACH ROW '
+                'WHEN ({old_active} IS DISTINCT FROM {new_active}) EXECUTE PROCEDURE {function}()'
+            ).format(
+                trigger=qn(trigger_name + '_update'), column=qn(column), table=qn(table),
+                old_active=old_active_sql, new_active=new_active_sql, function=qn(trigger_name)),
+        ]
+    else:
+        raise NotSupportedError('Activation triggers are not supported on {0}'.format(vendor))
+
+
+def get_uninstall_trigger_sql(schema_editor, model):
+    """
+    Returns the SQL statements that remove the activation triggers of the model.
+    """
+    qn = schema_editor.quote_name
+    table = model._meta.db_table
+    trigger_name = get_trigger_name(schema_editor, model)
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        return [
+            'DROP TRIGGER IF EXISTS {0}'.format(qn(trigger_name + '_insert')),
+            'DROP TRIGGER IF EXISTS {0}'.format(qn(trigger_name + '_update')),
+        ]
+    elif vendor == 'postgresql':
+        return [
+            'DROP TRIGGER IF EXISTS {0} ON {1}'.format(qn(trigger_name + '_insert'), qn(table)),
+            'DROP TRIGGER IF EXISTS {0} ON {1}'.format(qn(trigger_name + '_update'), qn(table)),
+            'DROP FUNCTION IF EXISTS {0}()'.format(qn(trigger_name)),
+        ]
+    else:
+        raise NotSupportedError('Activation triggers are not supported on {0}'.format(vendor))
@@ -15,21 +15,36 @@ def validate_activatable_models():
     """
     Raises a ValidationError for any ActivatableModel that has ForeignKeys or OneToOneFields that will
     cause cascading deletions to occur. This function also raises a ValidationError if the activatable
-    model has not defined a Boolean field with the field name defined by the ACTIVATABLE_FIELD_NAME variable
-    on the model.
+    model has not defined a field that is compatible with its ACTIVATION_STATE (a Boolean field by default)
+    with the field name defined by the ACTIVATABLE_FIELD_NAME variable on the model, or if its
+    ACTIVATION_PARENT_FIELD is not a ForeignKey to an activatable model or is cyclic, or if it is partitioned by
+    activation and cannot be partitioned.
     """
-    for model in get_activatable_models():
-        # Verify the activatable model has an activatable boolean field
+    activatable_models = get_activatable_models()
+    for model in activatable_models:
+        # Verify the activatable model has an activatable field that can store its activation state
         activatable_field = next((
             f for f in model._meta.fields
-            if f.__class__ == models.BooleanField and f.name == model.ACTIVATABLE_FIELD_NAME
+            if model.ACTIVATION_STATE.is_valid_field(f) and f.name == model.ACTIVATABLE_FIELD_NAME
         ), None)
         if activatable_field is None:
             raise ValidationError((
-                'Model {0} is an activatable model. It must define an activatable BooleanField that '
-                'has a field name of model.ACTIVATABLE_FIELD_NAME (which defaults to is_active)'.format(model)
+                'Model {0} is an activatable model. It must define an activatable field that is compatible '
+                'with model.ACTIVATION_STATE (a BooleanField by default) and has a field name of '
+                'model.ACTIVATABLE_FIELD_NAME (which defaults to is_active)'.format(model)
             ))
 
+        # Activation triggers store the changed ids in an integer column
+        if model.TRACK_ACTIVATIONS_WITH_TRIGGERS and not isinstance(model._meta.pk, models.IntegerField):
+            raise ValidationError((
+                'Model {0} tracks activations with triggers. Its primary key must be an integer field.'.format(model)
+            ))
+
+        if model.PARTITION_BY_ACTIVATION:
+            validate_partitioning(model, activatable_field)
+
+        validate_activation_parent(model, activatable_models)
+
         # Ensure all foreign keys and onetoone fields will not result in cascade deletions if not cascade deletable
         if not model.ALLOW_CASCADE_DELETE:
             for field in model._meta.fields:
@@ -41,3 +56,57 @@ def validate_activatable_models():
                             'If you want to explicitely allow cascade deletes, then you must set the '
                             'ALLOW_CASCADE_DELETE=True class variable on your model.'
                         ).format(model))
+
+
+def validate_activation_parent(model, activatable_models):
+    """
+    Raises a ValidationError if the ACTIVATION_PARENT_FIELD of the model or one of its ancestors is not a
+    ForeignKey to an activatable model. Inherited activation is computed with nested subqueries for each
+    ancestor, so the ancestors cannot be cyclic either.
+    """
+    ancestors = [model]
+    while ancestors[-1].ACTIVATION_PARENT_FIELD:
+        parent_field = next((
+            f for f in ancestors[-1]._meta.fields
+            if f.name == ancestors[-1].ACTIVATION_PARENT_FIELD and f.is_relation
+        ), None)
+        parent_model = parent_field.related_model if parent_field is not None else None
+        if parent_model not in activatable_models or parent_model in ancestors:
+            raise ValidationError((
+                'Model {0} inherits its activation from model.ACTIVATION_PARENT_FIELD. It must be a '
+                'ForeignKey to another activatable model that does not inherit its activation from '
+                'model {0}.'.format(ancestors[-1])
+            ))
+        ancestors.append(parent_model)
+
+
+def validate_partitioning(model, activatable_field):
+    """
+    Raises a ValidationError if the model cannot be partitioned by activation. The primary key of the
+    partitioned table is the pair of the primary key and the activatable field, so the activatable field
+    cannot be nullable and unique constraints and foreign keys that reference the model are not possible.
+    """
+    if activatable_field.null:
+        raise ValidationError((
+            'Model {0} is partitioned by activation. Its activatable field cannot be nullable.'
+        ).format(model))
+
+    # Unique constraints of partitioned tables must include the partition key
+    if any(
+        field.unique and not field.primary_key and field.name != model.ACTIVATABLE_FIELD_NAME
+        for field in model._meta.fields
+    ):
+        raise ValidationError((
+            'Model {0} is partitioned by activation. Its fields other than the primary key cannot be unique.'
+        ).format(model))
+
+    # Foreign keys, including the ones of many to many tables, must reference the whole primary key
+    related_fields = chain(
+        (related_object.field for related_object in model._meta.related_objects), model._meta.local_many_to_many)
+    if any(
+        field.remote_field.db_constraint if field.many_to_many else field.concrete and field.db_constraint
+        for field in related_fields
+    ):
+        raise ValidationError((
+            'Model {0} is partitioned by activation. Other tables cannot have foreign keys to it.'
+        ).format(model))
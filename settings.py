@@ -48,6 +48,8 @@ def configure_settings():
                 'django.contrib.sessions',
                 'django.contrib.admin',
                 'activatable_model',
+                'activatable_model.change_feed',
+                'activatable_model.triggers',
                 'activatable_model.tests',
             ),
             ROOT_URLCONF='activatable_model.urls',